@@ -3,13 +3,13 @@ require "re2"
 require "rust_regexp"
 require "pry"
 
-require_relative "helpers"
+require_relative "runner"
 
 # NOTES:
 # - re2 requires capture group for `.scan` to return the actual matches,
 #   without capture group it's just true/false
 
-EXAMPLES = {
+examples = register_examples({
   "literal/sherlock-en" => {
     haystack: {
       path: "./data/opensubtitles/en-sampled.txt"
@@ -34,6 +34,7 @@ EXAMPLES = {
       re2: '(?i:(Sherlock Holmes))',
       rust: '(?i)Sherlock Holmes'
     },
+    variants: ["fold"],
     validations: {
       count: {
         :* => 522
@@ -64,6 +65,7 @@ EXAMPLES = {
       re2: '(?i:(Шерлок Холмс))',
       rust: '(?i)Шерлок Холмс'
     },
+    variants: ["fold"],
     validations: {
       count: {
         :* => 746
@@ -85,34 +87,9 @@ EXAMPLES = {
       }
     }
   },
-}
+})
 
-EXAMPLES.each do |title, example|
-  puts "\n-- [#{title}]"
-
-  haystack = prepare_haystack(example)
-  regexps = prepare_regexps(example)
-
-  validate_matches!(example, haystack, regexps)
-
-  ruby_regexp, re2_regexp, rust_regexp = regexps.fetch_values(:ruby, :re2, :rust)
-
-  Benchmark.ips do |x|
-    x.report("ruby") do
-      ruby_scan(haystack, ruby_regexp)
-    end
-
-    x.report("re2") do
-      re2_scan(haystack, re2_regexp)
-    end
-
-    x.report("rust/regex") do
-      rust_scan(haystack, rust_regexp)
-    end
-
-    x.compare!
-  end
-end
+run_examples(examples) if __FILE__ == $PROGRAM_NAME
 
 
 # [Ubuntu 24.04.1 LTS | DigitalOcean CPU-optimized Intel 4 vCPUs / 8 GiB]
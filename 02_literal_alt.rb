@@ -3,9 +3,9 @@ require "re2"
 require "rust_regexp"
 require "pry"
 
-require_relative "helpers"
+require_relative "runner"
 
-EXAMPLES = {
+examples = register_examples({
   "literal-alt/sherlock-en" => {
     haystack: {
       path: "./data/opensubtitles/en-sampled.txt"
@@ -30,6 +30,7 @@ EXAMPLES = {
       re2: '(?i:(Sherlock Holmes|John Watson|Irene Adler|Inspector Lestrade|Professor Moriarty))',
       rust: '(?i)Sherlock Holmes|John Watson|Irene Adler|Inspector Lestrade|Professor Moriarty'
     },
+    variants: ["fold"],
     validations: {
       count: {
         :* => 725
@@ -60,6 +61,7 @@ EXAMPLES = {
       re2: '(?i:(Шерлок Холмс|Джон Уотсон|Ирен Адлер|инспектор Лестрейд|профессор Мориарти))',
       rust: '(?i)Шерлок Холмс|Джон Уотсон|Ирен Адлер|инспектор Лестрейд|профессор Мориарти'
     },
+    variants: ["fold"],
     validations: {
       count: {
         :* => 971
@@ -81,34 +83,9 @@ EXAMPLES = {
       }
     }
   },
-}
+})
 
-EXAMPLES.each do |title, example|
-  puts "\n-- [#{title}]"
-
-  haystack = prepare_haystack(example)
-  regexps = prepare_regexps(example)
-
-  validate_matches!(example, haystack, regexps)
-
-  ruby_regexp, re2_regexp, rust_regexp = regexps.fetch_values(:ruby, :re2, :rust)
-
-  Benchmark.ips do |x|
-    x.report("ruby") do
-      ruby_scan(haystack, ruby_regexp)
-    end
-
-    x.report("re2") do
-      re2_scan(haystack, re2_regexp)
-    end
-
-    x.report("rust/regex") do
-      rust_scan(haystack, rust_regexp)
-    end
-
-    x.compare!
-  end
-end
+run_examples(examples) if __FILE__ == $PROGRAM_NAME
 
 
 # [Ubuntu 24.04.1 LTS | DigitalOcean CPU-optimized Intel 4 vCPUs / 8 GiB]
@@ -3,12 +3,12 @@ require "re2"
 require "rust_regexp"
 require "pry"
 
-require_relative "helpers"
+require_relative "runner"
 
 # NOTES:
 # - match count in the first example differs from rebar across all engines
 
-EXAMPLES = {
+examples = register_examples({
   "cloudflare-redos/original" => {
     haystack: {
       path: "./data/cloudflare_redos/original.txt"
@@ -18,6 +18,12 @@ EXAMPLES = {
       re2: '(?:(?:"|\'|\]|\}|\\|\d|(?:nan|infinity|true|false|null|undefined|symbol|math)|`|-|\+)+[)]*;?((?:\s|-|~|!|\{\}|\|\||\+)*.*(?:.*=.*)))',
       rust: '(?:(?:"|\'|\]|\}|\\|\d|(?:nan|infinity|true|false|null|undefined|symbol|math)|`|-|\+)+[)]*;?((?:\s|-|~|!|\{\}|\|\||\+)*.*(?:.*=.*)))'
     },
+    adversarial: {
+      prefix: "x=",
+      pump: "x",
+      suffix: ""
+    },
+    timeout: 5,
     validations: {
       count_spans: {
         :* => 103
@@ -33,6 +39,12 @@ EXAMPLES = {
       re2: '(.*.*=.*)',
       rust: '.*.*=.*'
     },
+    adversarial: {
+      prefix: "x=",
+      pump: "x",
+      suffix: ""
+    },
+    timeout: 5,
     validations: {
       count_spans: {
         :* => 102
@@ -48,40 +60,21 @@ EXAMPLES = {
       re2: '(.*.*=.*)',
       rust: '.*.*=.*'
     },
+    adversarial: {
+      prefix: "x=",
+      pump: "x",
+      suffix: ""
+    },
+    timeout: 5,
     validations: {
       count_spans: {
         :* => 10000
       }
     }
   },
-}
-
-EXAMPLES.each do |title, example|
-  puts "\n-- [#{title}]"
-
-  haystack = prepare_haystack(example)
-  regexps = prepare_regexps(example)
-
-  validate_matches!(example, haystack, regexps)
-
-  ruby_regexp, re2_regexp, rust_regexp = regexps.fetch_values(:ruby, :re2, :rust)
-
-  Benchmark.ips do |x|
-    x.report("ruby") do
-      ruby_scan(haystack, ruby_regexp)
-    end
-
-    x.report("re2") do
-      re2_scan(haystack, re2_regexp)
-    end
-
-    x.report("rust/regex") do
-      rust_scan(haystack, rust_regexp)
-    end
+})
 
-    x.compare!
-  end
-end
+run_examples(examples) if __FILE__ == $PROGRAM_NAME
 
 
 # [Ubuntu 24.04.1 LTS | DigitalOcean CPU-optimized Intel 4 vCPUs / 8 GiB]
@@ -3,11 +3,12 @@ require "re2"
 require "rust_regexp"
 require "pry"
 
-require_relative "helpers"
+require_relative "runner"
 
 # NOTES:
 # - regexps are not joined (alternated) to test scenario when you need to keep a reference to regexp that matched
-# - ruby: can't handle string with invalid UTF-8 chars, had to run `.encode` with replacement -- outsider
+# - ruby: can't handle string with invalid UTF-8 chars, had to run `.encode` with replacement -- outsider;
+#         `--mode binary` compares it with scanning bytes (ASCII-8BIT haystack, `n` flag regexps)
 # - re2: \d{20,1024} - invalid repetition size, had to set 1000 as max
 # - rust set: \w, \d, \s, \b and wide scopes like [^a-zA-Z0-9_-] without additional unique patterns/suffixes, especially in
 #             non-capturing (?:) groups make set SUPER slow in comparison to sequential regexps;
@@ -15,7 +16,7 @@ require_relative "helpers"
 #             disabling unicode improves set performance to the level of sequential regexps (roughly);
 #             disabling unicode and removing regexps with wide scopes make set faster than sequential regexps
 
-EXAMPLES = {
+examples = register_examples({
   "noseyparker/default" => {
     haystack: {
       path: "./data/cpython-226484e4_medium.py",
@@ -51,52 +52,9 @@ EXAMPLES = {
       }
     }
   },
-}
+})
 
-EXAMPLES.each do |title, example|
-  puts "\n-- [#{title}]"
-
-  haystack = prepare_haystack(example)
-  haystack_valid_utf8 = haystack.encode("UTF-8", invalid: :replace, replace: "")
-
-  regexps = prepare_regexps(example)
-  sets = prepare_sets(example)
-
-  validate_matches!(example, haystack, regexps, sets, haystack_valid_utf8)
-
-  ruby_regexps, re2_regexps, rust_regexps = regexps.fetch_values(:ruby, :re2, :rust)
-  re2_set, rust_set = sets.fetch_values(:re2_set, :rust_set)
-
-  Benchmark.ips do |x|
-    x.report("ruby") do
-      ruby_regexps.map do |regexp|
-        ruby_scan(haystack_valid_utf8, regexp)
-      end
-    end
-
-    x.report("re2") do
-      re2_regexps.map do |regexp|
-        re2_scan(haystack, regexp)
-      end
-    end
-
-    x.report("rust/regex") do
-      rust_regexps.map do |regexp|
-        rust_scan(haystack, regexp)
-      end
-    end
-
-    x.report("re2 set") do
-      re2_set_scan(haystack, re2_set, re2_regexps)
-    end
-
-    x.report("rust/regex set") do
-      rust_set_scan(haystack, rust_set, rust_regexps)
-    end
-
-    x.compare!
-  end
-end
+run_examples(examples) if __FILE__ == $PROGRAM_NAME
 
 
 # [Ubuntu 24.04.1 LTS | DigitalOcean CPU-optimized Intel 4 vCPUs / 8 GiB]
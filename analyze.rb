@@ -0,0 +1,322 @@
+# NOTE:
+# - every ruby pattern of an example (or of `--rules`) is checked with
+#   `Regexp.linear_time?` (memoized matching, ruby 3.3+) and walked for
+#   constructs that backtrack super-linearly:
+#   - nested quantifiers: an unbounded group repeating an unbounded item, `(a+)+`
+#   - overlapping alternation: an unbounded group with branches that can match
+#     at the same position, `(?:\s|-|~)*` is fine, `(?:\d|\w)*` is not;
+#     branches of single chars (`(?:ACDT|ACST)*`, `(?:a|ab)*`) overlap only
+#     when one can match a prefix of the other, other branches when they can
+#     start with the same char
+#   - overlapping neighbours: two adjacent unbounded items matching a common
+#     char, `.*.*=.*` in `cloudflare-redos/*`, quadratic when scanning even
+#     with memoization, as every start position is matched again
+# - char sets are computed over ASCII plus literal chars, escapes without a
+#   known set (`\p{...}`) match anything, so findings err on the risky side
+# - `--confirm` benchmarks every flagged pattern in ruby on short adversarial
+#   inputs (see `redos.rb`): a literal required by the pattern (see
+#   `prefilter.rb`, so the optimizer does not reject the input up front),
+#   then a pumped char of the overlap, then a char outside it
+ANALYZE_ALPHABET = (0..127).map(&:chr).freeze
+ANALYZE_ESCAPE_SETS = {
+  "d" => ("0".."9").to_a,
+  "w" => [*"a".."z", *"A".."Z", *"0".."9", "_"],
+  "s" => [" ", "\t", "\n", "\v", "\f", "\r"],
+  "h" => [*"0".."9", *"a".."f", *"A".."F"]
+}.freeze
+ANALYZE_ZERO_WIDTH = %w[^ $ \\b \\B \\A \\z \\Z \\G].freeze
+ANALYZE_CONFIRM_MAX_LENGTH = 4096
+ANALYZE_CONFIRM_RUNS = 3
+ANALYZE_CONFIRM_SUFFIXES = ["!", "\x00", "\n", "a"].freeze
+
+def escape_chars(escaped)
+  set = ANALYZE_ESCAPE_SETS[escaped.downcase]
+  return escaped == escaped.downcase ? set : ANALYZE_ALPHABET - set if set
+
+  case escaped
+  when /[^a-zA-Z0-9]/
+    [escaped]
+  when *PREFILTER_ESCAPES.keys
+    [PREFILTER_ESCAPES.fetch(escaped)]
+  end
+end
+
+def analyze_class_chars(body)
+  negated = body.start_with?("^")
+  chars = []
+
+  body.delete_prefix("^").scan(/\\.|.-.|./m).each do |member|
+    if member.start_with?("\\")
+      member_chars = escape_chars(member[1])
+      return ANALYZE_ALPHABET unless member_chars
+
+      chars.concat(member_chars)
+    elsif member.size == 3
+      chars.concat(ANALYZE_ALPHABET.select { _1.between?(member[0], member[2]) }, [member[0], member[2]])
+    else
+      chars << member
+    end
+  end
+
+  negated ? ANALYZE_ALPHABET - chars : chars.uniq
+end
+
+# chars an atom can match, `[]` for zero width atoms
+def analyze_chars(text, ignore_case, dot_all)
+  return [] if ANALYZE_ZERO_WIDTH.include?(text)
+
+  chars =
+    if text == "."
+      dot_all ? ANALYZE_ALPHABET : ANALYZE_ALPHABET - ["\n"]
+    elsif text.start_with?("\\")
+      text.size == 2 && escape_chars(text[1]) || ANALYZE_ALPHABET
+    elsif text.start_with?("[")
+      analyze_class_chars(text[1...-1])
+    else
+      [text]
+    end
+
+  ignore_case ? chars.flat_map { [_1.downcase, _1.upcase] }.uniq : chars
+end
+
+# returns `[items, pos, flags]`, an item is `{ text:, chars:, unbounded:, min:,
+# quantified: }` for an atom or `{ text:, branches:, unbounded:, min:,
+# quantified: }` for a group
+def analyze_sequence(pattern, pos, flags)
+  items = []
+
+  until pattern[pos].nil? || pattern[pos] == "|" || pattern[pos] == ")"
+    item_start = pos
+    atom, pos = trie_atom(pattern, pos, false)
+
+    if atom
+      item = { chars: analyze_chars(atom.text, flags.include?("i"), flags.include?("m") || flags.include?("s")) }
+    else
+      header = pattern[pos..][/\A\((?:\?(?:[a-zA-Z]*(?:-[a-zA-Z]*)?[:)]|P?<[a-zA-Z_]\w*>|[=!>]|<[=!]))?/]
+      pos += header.size
+      group_flags = flags + header[/\A\(\?([a-zA-Z]*)/, 1].to_s
+
+      # flags of `(?i)` apply to the rest of the enclosing group
+      if header.end_with?(")")
+        flags = group_flags
+        next
+      end
+
+      branches, pos = analyze_alternation(pattern, pos, group_flags)
+      raise ArgumentError, "unterminated group in #{pattern}" unless pattern[pos] == ")"
+
+      pos += 1
+      item = { branches: branches, lookaround: header.match?(/\A\(\?<?[=!]/) }
+    end
+
+    quantifier_start = pos
+    quantifier, pos = parse_quantifier(pattern, pos)
+    min = quantifier ? quantifier[0] : 1
+    unbounded = pattern[quantifier_start...pos].match?(/\A(?:[*+]|\{\d+,\})/)
+
+    items << item.merge(text: pattern[item_start...pos], min: min, unbounded: unbounded, quantified: pos > quantifier_start)
+  end
+
+  [items, pos, flags]
+end
+
+def analyze_alternation(pattern, pos, flags)
+  branches = []
+
+  loop do
+    items, pos, flags = analyze_sequence(pattern, pos, flags)
+    branches << items
+    break unless pattern[pos] == "|"
+
+    pos += 1
+  end
+
+  [branches, pos]
+end
+
+# chars the first char of a sequence can be, looking past optional items
+def first_chars(items)
+  chars = []
+
+  items.each do |item|
+    next if item[:lookaround]
+
+    chars |= item[:branches] ? item[:branches].flat_map { first_chars(_1) } : item[:chars]
+    return chars if item[:min] >= 1 && (item[:branches] ? item[:branches].none?(&:empty?) : item[:chars].any?)
+  end
+
+  chars
+end
+
+def unbounded_inside?(item)
+  item[:branches]&.any? { |items| items.any? { _1[:unbounded] || unbounded_inside?(_1) } }
+end
+
+# groups that are not quantified are inlined, so `.*(?:.*=.*)` is `.*.*=.*`
+def inline_items(items)
+  items.flat_map do |item|
+    plain_group = item[:branches]&.size == 1 && !item[:lookaround] && item[:min] == 1 && !item[:unbounded]
+    plain_group ? inline_items(item[:branches].first) : [item]
+  end
+end
+
+# chars of every position of a branch of unquantified single chars, nil for
+# other branches
+def fixed_chars(items)
+  return if items.empty?
+
+  items.map do |item|
+    return if item[:branches] || item[:quantified] || item[:chars].empty?
+
+    item[:chars]
+  end
+end
+
+def branches_overlap?(branch, other)
+  branch_chars = fixed_chars(branch)
+  other_chars = fixed_chars(other)
+  return (first_chars(branch) & first_chars(other)).any? unless branch_chars && other_chars
+
+  # a shorter branch matching a prefix of the longer one, or the same text
+  branch_chars.zip(other_chars).all? { |chars, other_chars_at| other_chars_at.nil? || (chars & other_chars_at).any? }
+end
+
+def sequence_findings(items)
+  findings = []
+
+  items.each do |item|
+    next unless item[:branches]
+
+    if item[:unbounded] && !item[:lookaround]
+      findings << { kind: "nested quantifier", text: item[:text], chars: first_chars([item]) } if unbounded_inside?(item)
+
+      overlap = item[:branches].combination(2).find { |a, b| branches_overlap?(a, b) }
+      findings << { kind: "overlapping alternation", text: item[:text], chars: first_chars(overlap[0]) & first_chars(overlap[1]) } if overlap
+    end
+
+    item[:branches].each { findings.concat(sequence_findings(_1)) }
+  end
+
+  consuming = inline_items(items).reject { _1[:chars] == [] || _1[:lookaround] }
+  consuming.each_cons(2) do |a, b|
+    next unless a[:unbounded] && b[:unbounded]
+
+    overlap = (a[:chars] || first_chars([a])) & (b[:chars] || first_chars([b]))
+    findings << { kind: "overlapping neighbours", text: a[:text] + b[:text], chars: overlap } if overlap.any?
+  end
+
+  findings
+end
+
+# returns findings `{ kind:, text:, chars: }`, chars are the ones to pump
+def pattern_findings(pattern)
+  branches, pos = analyze_alternation(pattern, 0, "")
+  raise ArgumentError, "unbalanced `)` in #{pattern}" unless pos == pattern.size
+
+  branches.flat_map { sequence_findings(_1) }.uniq
+end
+
+def ruby_linear_time?(pattern)
+  Regexp.linear_time?(Regexp.new(pattern))
+rescue RegexpError
+  nil
+end
+
+def confirm_attack(pattern, finding)
+  chars = finding[:chars].empty? ? ANALYZE_ALPHABET : finding[:chars]
+
+  pump = chars.include?("a") ? "a" : chars.first
+  suffix = ANALYZE_CONFIRM_SUFFIXES.find { !chars.include?(_1) } || ""
+
+  { prefix: required_literals(pattern)&.first.to_s, pump: pump, suffix: suffix }
+end
+
+# returns growth class of ruby scan time on adversarial inputs, or the length timing out
+def confirm_finding(pattern, finding, example)
+  regexp = compile_regexp(:ruby, pattern, example)
+  attack = confirm_attack(pattern, finding)
+  points = []
+
+  adversarial_lengths(ANALYZE_CONFIRM_MAX_LENGTH).each do |length|
+    input = adversarial_input(attack, length)
+
+    status = run_with_watchdog(REDOS_TIME_LIMIT, regexp_timeout: REDOS_TIME_LIMIT) { ruby_scan(input, regexp) }
+    return "timed out at #{input.size} chars" unless status == :ok
+
+    times = Array.new(ANALYZE_CONFIRM_RUNS) do
+      start = Process.clock_gettime(Process::CLOCK_MONOTONIC)
+      ruby_scan(input, regexp)
+      Process.clock_gettime(Process::CLOCK_MONOTONIC) - start
+    end
+
+    points << [input.size, median(times)]
+  end
+
+  fit_points = points.last(REDOS_FIT_POINTS)
+  growth_class(fit_points, fit_complexity(fit_points))
+end
+
+def truncate_text(text, size)
+  text.size > size ? "#{text[0, size - 3]}..." : text
+end
+
+def run_analyze_example(title, example, engines: ENGINES, rules: nil, confirm: false)
+  patterns =
+    if rules
+      File.read(rules).split("\n")
+    else
+      # canonical `pattern:` (`--pattern`) may have no ruby translation
+      example_patterns(example).fetch(:ruby) do
+        puts "\n-- [#{title}] analyze skipped, pattern does not translate to ruby"
+        return
+      end
+    end
+
+  patterns = Array(patterns)
+
+  puts "\n-- [#{title}] analyze (#{rules || example[:pattern_path] || example[:patterns_path] || "patterns"})"
+
+  flagged = 0
+  not_linear = 0
+  invalid = 0
+
+  patterns.each_with_index do |pattern, idx|
+    linear = ruby_linear_time?(pattern)
+    findings =
+      begin
+        pattern_findings(pattern)
+      rescue ArgumentError => error
+        [{ kind: "unparsed", text: error.message, chars: nil }]
+      end
+
+    confirmable = confirm && !linear.nil? && findings.none? { _1[:chars].nil? }
+    confirmed = findings.to_h { [_1, confirm_finding(pattern, _1, example)] } if confirmable
+
+    flagged += 1 if findings.any?
+    not_linear += 1 if linear == false
+    invalid += 1 if linear.nil?
+
+    (findings.empty? ? [nil] : findings).each do |finding|
+      RESULTS << {
+        mode: "analyze",
+        example: title,
+        rule_idx: idx,
+        pattern: pattern,
+        linear_time: linear,
+        finding: finding && "#{finding[:kind]} `#{finding[:text]}`",
+        confirmed_growth: finding && confirmed&.fetch(finding)
+      }
+    end
+
+    next if findings.empty? && linear
+
+    linear_label = { true => "linear", false => "backtracking", nil => "invalid" }.fetch(linear)
+    puts format("%5d %-12s %s", idx, linear_label, truncate_text(pattern, 80))
+
+    findings.each do |finding|
+      puts format("%18s - %s `%s`%s", "", finding[:kind], truncate_text(finding[:text], 60), confirmed ? " (ruby: #{confirmed.fetch(finding)})" : "")
+    end
+  end
+
+  puts "#{patterns.size} patterns, #{not_linear} not linear time in ruby, #{invalid} invalid in ruby, #{flagged} with super-linear constructs"
+end
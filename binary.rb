@@ -0,0 +1,112 @@
+# NOTE:
+# - ruby raises on invalid UTF-8 (see `invalid_utf8` in limitations.rb), so it
+#   scans a scrubbed haystack (`valid_utf8_haystack`), a copy with invalid
+#   bytes removed; binary mode scans an ASCII-8BIT view of the haystack
+#   (`String#b` shares its buffer) with `n` flag regexps (`binary_compile:`
+#   of the adapter) instead
+# - rows of every engine with `binary_compile:`: scan of the haystack
+#   scrubbed once (as in scan mode), scrub then scan on every iteration, and
+#   binary scan; peak memory of every row is measured in a forked child
+# - rules not compiling with `n` flag (`\p{...}`, `\u{...}`) are left out of
+#   every row
+# - findings of every rule are compared as bytes, differences are expected
+#   on haystacks with invalid UTF-8 (scrubbing joins the bytes around it) or
+#   with non-ASCII text matched by constructs whose meaning depends on the
+#   encoding (see unicode.rb), others raise
+def binary_difference(haystack, pattern)
+  return "expected (scrubbed invalid UTF-8)" unless haystack.valid_encoding?
+
+  unicode_difference(haystack, pattern)
+end
+
+# returns `[rule indexes, binary regexps]` of rules compiling with `n` flag
+def binary_regexps(engine, rules, example)
+  adapter = engine_adapter(engine)
+
+  compiled = rules.each_with_index.filter_map do |rule, rule_idx|
+    [rule_idx, adapter[:binary_compile].call(rule, engine_options(engine, example))]
+  rescue RegexpError
+    nil
+  end
+
+  compiled.transpose.then { _1.empty? ? [[], []] : _1 }
+end
+
+def run_binary_example(title, example, engines: ENGINES)
+  puts "\n-- [#{title}] binary"
+
+  haystack = prepare_haystack(example)
+  haystack_valid_utf8 = valid_utf8_haystack(haystack)
+  patterns = example_patterns(example)
+
+  engines.select { patterns.key?(_1) && engine_adapter(_1)[:binary_compile] }.each do |engine|
+    adapter = engine_adapter(engine)
+    rules = Array(patterns.fetch(engine))
+    rule_idxs, regexps = binary_regexps(engine, rules, example)
+
+    puts "#{rules.size - rule_idxs.size} of #{rules.size} rules do not compile with `n` flag, left out" if rule_idxs.size < rules.size
+    next if rule_idxs.empty?
+
+    utf8_regexps = rule_idxs.map { cached_regexp(engine, rules[_1], example) }
+    scan = ->(engine_haystack, group) { group.map { adapter[:scan].call(engine_haystack, _1) } }
+
+    rows = {
+      "scan" => -> { scan.call(engine_haystack(engine, haystack, haystack_valid_utf8), utf8_regexps) },
+      "scrub" => -> { scan.call(engine_haystack(engine, haystack, nil), utf8_regexps) },
+      "binary" => -> { scan.call(haystack.b, regexps) }
+    }
+
+    scrubbed_findings = rows.fetch("scrub").call
+    binary_findings = rows.fetch("binary").call
+
+    rule_idxs.each_with_index do |rule_idx, idx|
+      scrubbed, binary = [scrubbed_findings[idx], binary_findings[idx]].map { |findings| findings.flatten.map { _1&.b } }
+      next if scrubbed == binary
+
+      difference = binary_difference(haystack, rules[rule_idx])
+
+      RESULTS << {
+        mode: "binary_difference",
+        example: title,
+        engine: engine.to_s,
+        label: ENGINE_LABELS.fetch(engine),
+        rule_idx: rule_idx,
+        pattern: rules[rule_idx],
+        scrub_match_count: scrubbed.size,
+        binary_match_count: binary.size,
+        difference: difference
+      }
+
+      puts format("rule %d findings differ: %s, %d scrubbed vs %d binary", rule_idx, difference, scrubbed.size, binary.size)
+      raise "Binary findings of rule #{rule_idx} for `#{engine}` are different from scrubbed ones" if difference == "unexpected"
+    end
+
+    report = Benchmark.ips do |x|
+      rows.each do |row, block|
+        x.report("#{ENGINE_LABELS.fetch(engine)} #{row}", &block)
+      end
+
+      x.compare!
+    end
+
+    puts "Peak memory:"
+
+    rows.keys.zip(report.entries).each do |row, entry|
+      peak = peak_rss_growth(&rows.fetch(row))
+
+      record_result(
+        mode: "binary",
+        example: title,
+        engine: engine,
+        entry: entry,
+        path: row,
+        rule_count: rule_idxs.size,
+        haystack_bytes: haystack.bytesize,
+        bytes_per_sec: entry.ips * haystack.bytesize,
+        peak_rss_growth: peak
+      )
+
+      puts format("%20s %11s MB", entry.label, peak ? format("%.1f", peak / 1_000_000.0) : "-")
+    end
+  end
+end
@@ -0,0 +1,84 @@
+# NOTE:
+# - process-wide LRU caches shared by all examples of a run
+# - haystacks (and their case folded copies) are bounded by total bytes,
+#   compiled regexps and sets by entry
+#   count, as their native memory is not visible from ruby
+# - cached haystacks are frozen, as they are shared between examples
+CACHE_LIMITS = {
+  haystack: 1024 * 1024 * 1024,
+  folded_haystack: 1024 * 1024 * 1024,
+  regexp: 4096,
+  set: 64
+}
+
+CACHES = Hash.new do |caches, name|
+  caches[name] = { entries: {}, size: 0, hits: 0, misses: 0, evictions: 0 }
+end
+
+def cache_entry_size(name, value)
+  case name
+  when :haystack
+    value.bytesize
+  when :folded_haystack
+    value[:folded].bytesize
+  else
+    1
+  end
+end
+
+def cached(name, key)
+  cache = CACHES[name]
+  entries = cache[:entries]
+
+  if entries.key?(key)
+    cache[:hits] += 1
+
+    # re-insert to mark as most recently used
+    value = entries.delete(key)
+    entries[key] = value
+
+    return value
+  end
+
+  cache[:misses] += 1
+
+  value = yield
+  value.freeze if name == :haystack
+
+  size = cache_entry_size(name, value)
+  limit = CACHE_LIMITS.fetch(name)
+  return value if size > limit
+
+  while cache[:size] + size > limit
+    _, evicted = entries.shift
+    cache[:size] -= cache_entry_size(name, evicted)
+    cache[:evictions] += 1
+  end
+
+  entries[key] = value
+  cache[:size] += size
+
+  value
+end
+
+def cache_stats
+  CACHES.transform_values { _1.slice(:hits, :misses, :evictions, :size) }
+end
+
+def merge_cache_stats(stats)
+  stats.each do |name, counts|
+    cache = CACHES[name]
+    counts.except(:size).each { |counter, count| cache[counter] += count }
+  end
+end
+
+def print_cache_stats(stats = cache_stats)
+  stats = stats.reject { |_, counts| counts.values_at(:hits, :misses, :evictions).all?(&:zero?) }
+  return if stats.empty?
+
+  puts "\nCache:"
+
+  stats.each do |name, counts|
+    puts format("%20s %8d hits %8d misses %8d evictions", name, counts[:hits], counts[:misses], counts[:evictions])
+  end
+end
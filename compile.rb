@@ -0,0 +1,67 @@
+# NOTE:
+# - compile cost is measured per example: a single pattern, every pattern of
+#   a rule file one by one (`ruby`, `re2`, `rust`) or a whole set (`re2 set`, `rust/regex set`)
+# - memory is RSS growth while keeping COMPILE_MEMORY_COPIES compiled copies
+#   alive, divided by the number of copies; it covers native allocations of
+#   re2/rust that are invisible to ObjectSpace, but is page-granular and noisy
+#   for small patterns
+COMPILE_MEMORY_COPIES = 20
+
+def compile_memory(copies: COMPILE_MEMORY_COPIES)
+  GC.start
+  before = rss_bytes
+  compiled = Array.new(copies) { yield }
+  after = rss_bytes
+
+  compiled.clear
+  [after - before, 0].max / copies
+end
+
+def compilers(example, engines)
+  patterns = example_patterns(example)
+  compilers = {}
+
+  patterns.slice(*engines).each do |engine, pattern|
+    compilers[engine] = -> { compile_regexps({ engine => pattern }, example) }
+  end
+
+  if example[:patterns_path]
+    set_engines.intersection(engines).each do |engine|
+      compilers[engine] = -> { compile_set(engine, patterns.fetch(engine_adapter(engine)[:set_of]), example) }
+    end
+  end
+
+  compilers
+end
+
+def run_compile_example(title, example, engines: ENGINES)
+  puts "\n-- [#{title}] compile"
+
+  compilers = compilers(example, engines)
+  pattern_count = Array(example_patterns(example).values.first).size
+
+  report = Benchmark.ips do |x|
+    compilers.each do |engine, compiler|
+      x.report(ENGINE_LABELS.fetch(engine), &compiler)
+    end
+
+    x.compare!
+  end
+
+  puts "Memory:"
+
+  compilers.keys.zip(report.entries).each do |engine, entry|
+    memory_bytes = compile_memory(&compilers.fetch(engine))
+
+    record_result(
+      mode: "compile",
+      example: title,
+      engine: engine,
+      entry: entry,
+      pattern_count: pattern_count,
+      memory_bytes: memory_bytes
+    )
+
+    puts format("%20s %12.1f KB", entry.label, memory_bytes / 1024.0)
+  end
+end
@@ -0,0 +1,169 @@
+# NOTE:
+# - every engine is an adapter registered with `register_engine`, modes
+#   benchmark all registered engines (narrowed with `--engine`), so a new
+#   engine, or another build of re2/rust_regexp, needs no change in examples
+# - adapter of a regexp engine:
+#   - `compile: ->(pattern, options)`, `options: ->(example)` maps example
+#     settings such as `unicode: false` to compile options
+#   - `valid: ->(regexp)` for engines returning invalid regexps instead of raising
+#   - `scan`, `count`, `spans` (optional) take `(haystack, regexp)`, see helpers.rb
+#   - `match_scan` (optional) returns whole matches of a pattern without
+#     captures, for engines whose `scan` returns captures only; it scans
+#     `spans_haystack`
+#   - `union_spans: ->(haystack, regexp, rule_count)` and
+#     `rule_spans: ->(haystack, regexps)` (optional) return
+#     `[regex_idx, start, end, ...]` of rules alternated in one regexp and of
+#     rules scanned one by one, see multi_pattern.rb; they scan `spans_haystack`
+#   - `binary_compile: ->(pattern, options)` (optional) compiles for binary
+#     haystacks, for engines without `:unicode_option` (ruby `n` flag)
+#   - `haystack`/`spans_haystack`: `:utf8` (as read), `:valid_utf8` (scrubbed)
+#     or `:binary`
+#   - `patterns`: engine whose patterns of `patterns:` examples are used, so
+#     an adapter can reuse e.g. `re2:` patterns; `pattern: ->(rule)` maps a
+#     rule of a rule file to the engine's syntax
+#   - `syntax`: `:ruby`, `:re2` or `:rust` (default: `patterns`), what
+#     canonical `pattern:` examples are translated to (see translate.rb)
+# - adapter of a set engine has `set_of:` the regexp engine whose regexps it
+#   rescans, `compile: ->(patterns, options)`, and `scan`, `count`, `spans`,
+#   `rule_spans`, `prefilter_scan` taking `(haystack, set, regexps)`
+# - `capabilities`: `:regexp_timeout` (`Regexp.timeout` interrupts scans),
+#   `:unicode_option` (`unicode: false` changes compilation),
+#   `:wide_scope_slowdown` (set engine slowed down by wide scopes of rules,
+#   measured in rule-profile mode)
+ENGINE_ADAPTERS = {}
+ENGINE_LABELS = {}
+ENGINES = []
+
+ENGINE_HAYSTACKS = %i[utf8 valid_utf8 binary].freeze
+
+def register_engine(engine, label:, compile:, scan:, options: ->(_) { {} }, haystack: :utf8, capabilities: [], **adapter)
+  raise ArgumentError, "engine `#{engine}` is already registered" if ENGINE_ADAPTERS.key?(engine)
+  raise ArgumentError, "unknown haystack: #{haystack}" unless ENGINE_HAYSTACKS.include?(haystack)
+
+  ENGINE_ADAPTERS[engine] = {
+    label: label,
+    compile: compile,
+    scan: scan,
+    options: options,
+    haystack: haystack,
+    spans_haystack: haystack,
+    capabilities: capabilities,
+    patterns: engine,
+    pattern: ->(rule) { rule },
+    syntax: adapter.fetch(:patterns, engine),
+    **adapter
+  }
+
+  ENGINE_LABELS[engine] = label
+  ENGINES << engine
+end
+
+def engine_adapter(engine)
+  ENGINE_ADAPTERS.fetch(engine) { raise ArgumentError, "unknown engine: #{engine}" }
+end
+
+def set_engine?(engine)
+  engine_adapter(engine).key?(:set_of)
+end
+
+def regexp_engines
+  ENGINES.reject { set_engine?(_1) }
+end
+
+def set_engines
+  ENGINES.select { set_engine?(_1) }
+end
+
+def engine_supports?(engine, capability)
+  engine_adapter(engine)[:capabilities].include?(capability)
+end
+
+# NOTE:
+# - haystack an engine scans, `key` is `:haystack` or `:spans_haystack` of
+#   its adapter; `binary_haystacks` keeps binary copies between calls, so
+#   scanners make them once, outside of benchmarks
+def engine_haystack(engine, haystack, haystack_valid_utf8, key = :haystack, binary_haystacks: nil)
+  case engine_adapter(engine).fetch(key)
+  when :valid_utf8
+    haystack_valid_utf8 || valid_utf8_haystack(haystack)
+  when :binary
+    binary_haystacks ? binary_haystacks[haystack] ||= haystack.b : haystack.b
+  else
+    haystack
+  end
+end
+
+register_engine(
+  :ruby,
+  label: "ruby",
+  compile: ->(pattern, _) { Regexp.new(pattern) },
+  binary_compile: ->(pattern, _) { Regexp.new(pattern.b, Regexp::NOENCODING) },
+  scan: method(:ruby_scan),
+  count: method(:ruby_count),
+  spans: method(:ruby_spans),
+  rule_spans: method(:ruby_rule_spans),
+  union_spans: method(:ruby_union_spans),
+  haystack: :valid_utf8,
+  capabilities: [:regexp_timeout]
+)
+
+register_engine(
+  :re2,
+  label: "re2",
+  compile: ->(pattern, options) { RE2(pattern, **options) },
+  valid: ->(regexp) { regexp.ok? },
+  options: method(:re2_options),
+  scan: method(:re2_scan),
+  count: method(:re2_count),
+  # scanner builds strings for captures only, so count with captures stripped
+  count_pattern: method(:strip_captures),
+  spans: method(:re2_spans),
+  match_scan: method(:re2_match_scan),
+  union_spans: method(:re2_union_spans),
+  spans_haystack: :binary,
+  pattern: method(:capturize_re2_pattern),
+  capabilities: [:unicode_option]
+)
+
+register_engine(
+  :rust,
+  label: "rust/regex",
+  compile: ->(pattern, options) { RustRegexp.new(pattern, **options) },
+  options: method(:rust_options),
+  scan: method(:rust_scan),
+  count: method(:rust_count),
+  # no API returning match positions, stream mode recovers them from match strings
+  search_spans: ->(haystack, regexp, start = 0) { rust_search_spans(haystack, regexp, start) },
+  capabilities: [:unicode_option]
+)
+
+# re2 set is always compiled in UTF-8 mode, as it was in the original benchmarks
+register_engine(
+  :re2_set,
+  label: "re2 set",
+  set_of: :re2,
+  compile: lambda do |patterns, _|
+    set = RE2::Set.new
+    patterns.each { set.add(_1) }
+    set.compile
+    set
+  end,
+  scan: method(:re2_set_scan),
+  count: method(:re2_set_count),
+  spans: method(:re2_set_spans),
+  rule_spans: method(:re2_set_rule_spans),
+  spans_haystack: :binary,
+  prefilter_scan: ->(haystack, prefilter, regexps) { re2_set_prefilter_scan(haystack, prefilter, regexps) }
+)
+
+register_engine(
+  :rust_set,
+  label: "rust/regex set",
+  set_of: :rust,
+  compile: ->(patterns, options) { RustRegexp::Set.new(patterns, **options) },
+  options: method(:rust_options),
+  scan: method(:rust_set_scan),
+  count: method(:rust_set_count),
+  prefilter_scan: ->(haystack, prefilter, regexps) { rust_set_prefilter_scan(haystack, prefilter, regexps) },
+  capabilities: [:wide_scope_slowdown]
+)
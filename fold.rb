@@ -0,0 +1,96 @@
+# NOTE:
+# - fast path for `(?i)` patterns that are a literal or an alternation of
+#   literals: haystack is case folded once (cached per haystack), folded
+#   literals are searched exactly, matches are mapped back to the original
+# - folding is `downcase(:fold)`, the full Unicode case folding Onigmo uses
+#   for `(?i)`, so e.g. `ß` matches `ss`
+# - folded offsets are the original ones unless some char folds to a
+#   different byte length (`ẞ`, `İ`, ...) or to several chars (`ß` -> `ss`),
+#   such chars are kept in `changes` as `[folded_start, folded_end, start,
+#   end]`; a match starting or ending inside a folded char cannot be mapped
+#   and is skipped
+# - ruby only, other engines are fast on case-insensitive literals already
+UTF8_LEAD_BYTES = "\x00-\x7F\xC0-\xFF".b.freeze
+UTF8_CONTINUATION_BYTES = "\x80-\xBF".b.freeze
+
+def casei_literals(pattern)
+  alternation = pattern.delete_prefix("(?i)")
+  return if alternation == pattern
+
+  literals = alternation.split("|", -1).map do |literal|
+    return unless literal.match?(/\A(?:[^.\\+*?()|\[\]{}^$]|\\[^a-zA-Z0-9])+\z/)
+
+    literal.gsub(/\\(.)/, '\1').downcase(:fold)
+  end
+
+  literals.uniq
+end
+
+def utf8_layout(string)
+  string.b.tr(UTF8_LEAD_BYTES, "\x00").tr(UTF8_CONTINUATION_BYTES, "\x01")
+end
+
+def fold_haystack(haystack)
+  folded = haystack.downcase(:fold)
+  return { folded: folded, changes: [] } if utf8_layout(folded) == utf8_layout(haystack)
+
+  changes = []
+  folded_position = 0
+  position = 0
+
+  haystack.each_char do |char|
+    folded_char = char.downcase(:fold)
+    folded_bytes = folded_char.bytesize
+    if folded_bytes != char.bytesize || folded_char.size != 1
+      changes << [folded_position, folded_position + folded_bytes, position, position + char.bytesize]
+    end
+
+    folded_position += folded_bytes
+    position += char.bytesize
+  end
+
+  { folded: folded, changes: changes }
+end
+
+def fold_offset(changes, folded_position)
+  idx = (changes.bsearch_index { _1[0] > folded_position } || changes.size) - 1
+  return folded_position if idx.negative?
+
+  folded_start, folded_end, start, finish = changes[idx]
+
+  if folded_position < folded_end
+    folded_position == folded_start ? start : nil
+  else
+    finish + folded_position - folded_end
+  end
+end
+
+# single literal is searched with `byteindex` (memmem), alternation with a regexp
+def fold_search(literals)
+  literals.size == 1 ? literals.first : Regexp.union(literals)
+end
+
+def ruby_fold_scan(haystack, folded_haystack, search)
+  folded = folded_haystack[:folded]
+  changes = folded_haystack[:changes]
+  matches = []
+
+  add_match = lambda do |folded_start, folded_finish|
+    start = fold_offset(changes, folded_start)
+    finish = fold_offset(changes, folded_finish)
+    matches << haystack.byteslice(start, finish - start) if start && finish
+  end
+
+  if search.is_a?(String)
+    position = 0
+
+    while (start = folded.byteindex(search, position))
+      position = start + search.bytesize
+      add_match.call(start, position)
+    end
+  else
+    ruby_each_match(folded, search) { |folded_start, folded_finish| add_match.call(folded_start, folded_finish) }
+  end
+
+  matches
+end
@@ -0,0 +1,75 @@
+# NOTE:
+# - before validation and benchmark, every scanner of an example runs once
+#   under a time budget, in a forked child killed by a watchdog when the
+#   budget runs out, as native engines cannot be interrupted from ruby
+# - ruby scans in that child also run with `Regexp.timeout` (engines with
+#   `:regexp_timeout` capability), so backtracking stops with
+#   Regexp::TimeoutError before the watchdog fires
+# - engines over budget are recorded as `timed_out` results and left out of
+#   validation and benchmark, the run goes on with the other engines
+# - budget is `--timeout` seconds (0 turns the guard off), examples can
+#   override it with `timeout: 5` or per engine with `timeout: { ruby: 1, :* => 5 }`
+# - scan mode guards plain and variant rows, sweep and pattern-count modes
+#   guard every haystack size and rule count before measuring it; redos mode
+#   has a watchdog of its own (REDOS_TIME_LIMIT), other modes are not guarded
+SCAN_TIMEOUT = 10.0
+REGEXP_TIMEOUT_STATUS = 3
+
+def scan_timeout(example, engine, default)
+  timeout = example.fetch(:timeout, default)
+  timeout.is_a?(Hash) ? timeout.fetch(engine) { timeout.fetch(:*, default) } : timeout
+end
+
+# returns :ok, :regexp_timeout or :watchdog_timeout
+def run_with_watchdog(timeout, regexp_timeout: nil)
+  pid = fork do
+    Regexp.timeout = regexp_timeout if regexp_timeout
+    yield
+    exit!(0)
+  rescue Regexp::TimeoutError
+    exit!(REGEXP_TIMEOUT_STATUS)
+  rescue StandardError
+    # skip at_exit handlers of the parent, e.g. removal of its tempfiles
+    exit!(1)
+  end
+
+  waiter = Process.detach(pid)
+
+  unless waiter.join(timeout)
+    Process.kill(:KILL, pid)
+    waiter.join
+    return :watchdog_timeout
+  end
+
+  # other failures are raised again by the scan in the parent process
+  waiter.value.exitstatus == REGEXP_TIMEOUT_STATUS ? :regexp_timeout : :ok
+end
+
+# `record` is merged into timed out results, e.g. `variant:` or `haystack_bytes:`
+def guard_engines(title, example, scanners, haystack, haystack_valid_utf8, timeout: SCAN_TIMEOUT, mode: "scan", **record)
+  scanners.filter_map do |engine, scanner|
+    budget = scan_timeout(example, engine, timeout)
+    next engine unless budget&.positive?
+
+    status = run_with_watchdog(budget, regexp_timeout: engine_supports?(engine, :regexp_timeout) ? budget : nil) do
+      scanner.call(haystack, haystack_valid_utf8)
+    end
+    next engine if status == :ok
+
+    label = [ENGINE_LABELS.fetch(engine), record[:variant]].compact.join(" ")
+
+    RESULTS << {
+      mode: mode,
+      example: title,
+      engine: engine.to_s,
+      label: label,
+      **record,
+      timed_out: true,
+      timeout: budget,
+      timeout_reason: status.to_s
+    }
+
+    puts format("%20s timed out after %.1fs (%s)", label, budget, status == :regexp_timeout ? "Regexp.timeout" : "killed by watchdog")
+    nil
+  end
+end
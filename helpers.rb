@@ -1,3 +1,8 @@
+require "strscan"
+
+require_relative "cache"
+require_relative "line_index"
+
 def ruby_scan(haystack, regexp)
   haystack.scan(regexp)
 end
@@ -10,6 +15,175 @@ def rust_scan(haystack, regexp)
   regexp.scan(haystack)
 end
 
+# NOTE:
+# - match iterators yield start and end of every match from `start`, and
+#   step over empty matches as `scan` does; count, spans and union functions
+#   are built on them
+# - ruby: StringScanner only tracks positions, `fixed_anchor: true` keeps
+#   `\b`, `^` and lookbehinds seeing the text before the scan position, like
+#   `scan`; the scanner is yielded too, for groups of the match
+def ruby_each_match(haystack, regexp, start = 0)
+  scanner = StringScanner.new(haystack, fixed_anchor: true)
+  scanner.pos = start
+
+  while scanner.skip_until(regexp)
+    yield scanner.pos - scanner.matched_size, scanner.pos, scanner
+
+    if scanner.matched_size.zero?
+      break if scanner.eos?
+
+      scanner.skip(/./m)
+    end
+  end
+end
+
+# NOTE:
+# - re2: haystack must be binary (`haystack.b`), so MatchData#begin/#end
+#   return byte offsets instead of character offsets; the match is yielded
+#   too, for groups of the match
+# - `submatches:` is the number of capture groups `match` extracts on top of
+#   the whole match, and with 0 it returns true/false only, so 1 is the
+#   fewest returning positions; for a pattern without groups re2 then
+#   tracks the whole match only and finds both ends of it with its DFAs
+def re2_each_match(haystack, regexp, start = 0, submatches: 1)
+  position = start
+
+  while position <= haystack.bytesize && (match = regexp.match(haystack, startpos: position, submatches: submatches))
+    match_start = match.begin(0)
+    position = match.end(0)
+    yield match_start, position, match
+
+    # step over empty match and the rest of its UTF-8 character
+    if match_start == position
+      position += 1
+      position += 1 while (haystack.getbyte(position) || 0) & 0b1100_0000 == 0b1000_0000
+    end
+  end
+end
+
+# NOTE:
+# - count functions report the number of matches without building match strings
+# - re2: regexp must be compiled without captures (see `strip_captures`),
+#   scanner then yields an empty array per match instead of strings
+# - rust: rust_regexp has no API to iterate matches without building strings,
+#   so count is the size of `scan`
+def ruby_count(haystack, regexp)
+  count = 0
+  ruby_each_match(haystack, regexp) { count += 1 }
+  count
+end
+
+def re2_count(haystack, regexp)
+  regexp.scan(haystack).count
+end
+
+def rust_count(haystack, regexp)
+  regexp.scan(haystack).size
+end
+
+def re2_set_count(haystack, set, regexps)
+  set.match(haystack).sum { |regex_idx| re2_count(haystack, regexps[regex_idx]) }
+end
+
+def rust_set_count(haystack, set, regexps)
+  set.match(haystack).sum { |regex_idx| rust_count(haystack, regexps[regex_idx]) }
+end
+
+# NOTE:
+# - spans functions return byte offsets of matches as a flat array:
+#   `[start, end, start, end, ...]`
+# - ruby: offsets are what `MatchData#byteoffset(0)` returns, without
+#   allocating MatchData
+# - re2: haystack must be binary, see `re2_each_match`
+# - rust: rust_regexp has no API returning match positions
+def ruby_spans(haystack, regexp, start = 0)
+  spans = []
+  ruby_each_match(haystack, regexp, start) { |match_start, match_end| spans << match_start << match_end }
+  spans
+end
+
+def re2_spans(haystack, regexp, start = 0)
+  spans = []
+  re2_each_match(haystack, regexp, start) { |match_start, match_end| spans << match_start << match_end }
+  spans
+end
+
+# NOTE:
+# - re2 scanner returns captures only, so patterns are wrapped in a capture
+#   group (see `capturize_re2_pattern`), which makes re2 track captures;
+#   `re2_match_scan` returns whole matches of a pattern without captures
+# - haystack must be binary as in `re2_spans`, matches are returned as UTF-8
+#   strings as the other engines return them
+def re2_match_scan(haystack, regexp)
+  matches = []
+  re2_each_match(haystack, regexp) { |_, _, match| matches << match[0].force_encoding(Encoding::UTF_8) }
+  matches
+end
+
+def re2_set_spans(haystack, set, regexps)
+  set.match(haystack).sort.flat_map { |regex_idx| re2_spans(haystack, regexps[regex_idx]) }
+end
+
+# NOTE:
+# - rule spans functions return rule index and byte offsets of matches of
+#   several rules as a flat array: `[regex_idx, start, end, ...]`
+# - union: rules are alternated in a single regexp (see `union_pattern`),
+#   which is scanned once; group `regex_idx + 1` tells which rule matched
+# - union reports leftmost-first matches, so a match of one rule hides
+#   matches of other rules overlapping it: it is not a drop-in replacement
+#   for scanning every rule, see `union_differences` for what it misses
+def union_pattern(patterns)
+  patterns.map { "(#{strip_captures(_1)})" }.join("|")
+end
+
+def ruby_union_spans(haystack, regexp, rule_count)
+  spans = []
+  groups = (1..rule_count).to_a
+
+  # `values_at` fetches every group in one call; `captures` of strscan < 3.0.8
+  # returns "" for groups that did not participate
+  ruby_each_match(haystack, regexp) do |match_start, match_end, scanner|
+    spans << scanner.values_at(*groups).index { _1 } << match_start << match_end
+  end
+
+  spans
+end
+
+def re2_union_spans(haystack, regexp, rule_count)
+  spans = []
+  groups = (1..rule_count).to_a
+
+  re2_each_match(haystack, regexp, submatches: rule_count) do |match_start, match_end, match|
+    spans << match.values_at(*groups).index { _1 } << match_start << match_end
+  end
+
+  spans
+end
+
+# returns `[missed, extra]`: counts of rule by rule `[regex_idx, start, end]`
+# spans missing from the union spans, and of union spans not found rule by rule
+def union_differences(rule_spans, union_spans)
+  expected = rule_spans.each_slice(3).tally
+  actual = union_spans.each_slice(3).tally
+
+  missed = expected.sum { |span, count| [count - actual.fetch(span, 0), 0].max }
+  extra = actual.sum { |span, count| [count - expected.fetch(span, 0), 0].max }
+
+  [missed, extra]
+end
+
+def ruby_rule_spans(haystack, regexps)
+  regexps.each_with_index.flat_map do |regexp, regex_idx|
+    ruby_spans(haystack, regexp).each_slice(2).flat_map { [regex_idx, *_1] }
+  end
+end
+
+def re2_set_rule_spans(haystack, set, regexps)
+  set.match(haystack).sort.flat_map do |regex_idx|
+    re2_spans(haystack, regexps[regex_idx]).each_slice(2).flat_map { [regex_idx, *_1] }
+  end
+end
+
 def re2_set_scan(haystack, set, regexps)
   matched_regex_idxs = set.match(haystack)
 
@@ -28,73 +202,96 @@ def rust_set_scan(haystack, set, regexps)
   end
 end
 
-def prepare_haystack(example)
-  path = example[:haystack].fetch(:path)
-  line_start = example.dig(:haystack, :line_start)
-  line_end = example.dig(:haystack, :line_end)
+# NOTE:
+# - scanner of every engine is called with `(haystack, haystack_valid_utf8)`,
+#   and scans the one its adapter asks for (see engines.rb): ruby scans the
+#   latter as it raises on invalid UTF-8 (see `invalid_utf8` in limitations.rb)
+# - binary copies of haystacks are made on the first call (validation), outside of benchmark
+def scanners(regexps, sets = nil, operation: :scan, haystack_key: :haystack)
+  scanners = {}
+  binary_haystacks = {}.compare_by_identity
 
-  haystack = File.read(path)
+  regexps.each do |engine, group|
+    scan = engine_adapter(engine).fetch(operation)
 
-  if line_start || line_end
-    haystack = haystack.split("\n")[line_start...line_end].join("\n")
+    scanners[engine] = lambda do |haystack, haystack_valid_utf8|
+      chosen_haystack = engine_haystack(engine, haystack, haystack_valid_utf8, haystack_key, binary_haystacks: binary_haystacks)
+
+      if group.is_a?(Array)
+        group.map { |regexp| scan.call(chosen_haystack, regexp) }
+      else
+        scan.call(chosen_haystack, group)
+      end
+    end
   end
 
-  haystack
-end
+  sets&.each do |engine, set|
+    scan = engine_adapter(engine).fetch(operation)
+    original_regexps = regexps[engine_adapter(engine)[:set_of]]
 
-def prepare_regexps(example)
-  if pattern_path = example[:pattern_path]
-    pattern = File.read(pattern_path)
+    scanners[engine] = lambda do |haystack, haystack_valid_utf8|
+      chosen_haystack = engine_haystack(engine, haystack, haystack_valid_utf8, haystack_key, binary_haystacks: binary_haystacks)
+      scan.call(chosen_haystack, set, original_regexps)
+    end
+  end
 
-    patterns = {
-      ruby: pattern,
-      re2: pattern,
-      rust: pattern
-    }
+  scanners
+end
 
-    compile_regexps(patterns, example)
-  elsif patterns_path = example[:patterns_path]
-    patterns = File.read(patterns_path).split("\n")
+def valid_utf8_haystack(haystack)
+  return haystack if haystack.valid_encoding?
 
-    re2_options = {}
-    re2_options[:utf8] = false if example[:unicode] == false
+  haystack.encode("UTF-8", invalid: :replace, replace: "")
+end
 
-    rust_options = {}
-    rust_options[:unicode] = false if example[:unicode] == false
+def prepare_haystack(example)
+  path = example[:haystack].fetch(:path)
+  line_start = example.dig(:haystack, :line_start)
+  line_end = example.dig(:haystack, :line_end)
 
-    ruby_regexps = patterns.map { Regexp.new(_1) }
-    re2_regexps = patterns.map { RE2(capturize_re2_pattern(_1), **re2_options) }
-    rust_regexps = patterns.map { RustRegexp.new(_1, **rust_options) }
+  cached(:haystack, [path, line_start, line_end, Encoding.default_external]) do
+    if line_start || line_end
+      read_lines(path, line_start, line_end)
+    else
+      File.read(path)
+    end
+  end
+end
 
-    {
-      ruby: ruby_regexps,
-      re2: re2_regexps,
-      rust: rust_regexps
-    }
+# NOTE:
+# - patterns of every registered regexp engine, `patterns:` examples give
+#   them per engine (adapters may reuse patterns of another engine),
+#   `pattern:` examples give one canonical pattern (see translate.rb)
+def example_patterns(example)
+  if pattern = example[:pattern]
+    translated_patterns(pattern, example)
+  elsif pattern_path = example[:pattern_path]
+    pattern = File.read(pattern_path)
+    regexp_engines.to_h { [_1, pattern] }
+  elsif patterns_path = example[:patterns_path]
+    rule_patterns(File.read(patterns_path).split("\n"))
   else
-    compile_regexps(example[:patterns], example)
+    regexp_engines.filter_map do |engine|
+      pattern = example[:patterns][engine_adapter(engine)[:patterns]]
+      [engine, pattern] if pattern
+    end.to_h
   end
 end
 
-def prepare_sets(example)
-  if patterns_path = example[:patterns_path]
-    patterns = File.read(patterns_path).split("\n")
-
-    re2_set = RE2::Set.new
-    patterns.each do |pattern|
-      re2_set.add(capturize_re2_pattern(pattern))
-    end
-    re2_set.compile
-
-    rust_options = {}
-    rust_options[:unicode] = false if example[:unicode] == false
+def rule_patterns(patterns)
+  regexp_engines.to_h do |engine|
+    [engine, patterns.map(&engine_adapter(engine)[:pattern])]
+  end
+end
 
-    rust_set = RustRegexp::Set.new(patterns, **rust_options)
+def prepare_regexps(example)
+  compile_regexps(example_patterns(example), example, cached: true)
+end
 
-    {
-      re2_set: re2_set,
-      rust_set: rust_set
-    }
+def prepare_sets(example)
+  if example[:patterns_path]
+    patterns = example_patterns(example)
+    set_engines.to_h { [_1, cached_set(_1, patterns.fetch(engine_adapter(_1)[:set_of]), example)] }
   else
     raise NotImplementedError
   end
@@ -107,64 +304,150 @@ def capturize_re2_pattern(pattern)
   pattern.start_with?('(') ? pattern : "(#{pattern})"
 end
 
-def compile_regexps(patterns, example)
-  patterns.map do |engine, pattern|
-    regexp =
-      case engine
-      when :ruby
-        Regexp.new(pattern)
-      when :re2
-        options = {}
-        options[:utf8] = false if example[:unicode] == false
-
-        RE2(pattern, **options)
-      when :rust
-        options = {}
-        options[:unicode] = false if example[:unicode] == false
-
-        RustRegexp.new(pattern, **options)
-      end
+# NOTE:
+# - turns every unnamed capturing group into a non-capturing one, which does not
+#   change what the whole pattern matches
+# - patterns with backreferences (`\1`, `\k<name>`) are returned unchanged,
+#   stripping the groups they refer to would change or break them
+def strip_captures(pattern)
+  return pattern if pattern.match?(/(?<!\\)(?:\\\\)*\\(?:[1-9]|k<)/)
+
+  result = +""
+  class_start = nil
+  escaped = false
+
+  pattern.each_char.with_index do |char, index|
+    if escaped
+      escaped = false
+    elsif char == "\\"
+      escaped = true
+    elsif class_start
+      # `]` right after `[` or `[^` is a literal
+      class_start = nil if char == "]" && index > class_start + (pattern[class_start + 1] == "^" ? 2 : 1)
+    elsif char == "["
+      class_start = index
+    elsif char == "(" && pattern[index + 1] != "?"
+      result << "(?:"
+      next
+    end
 
-    [engine, regexp]
-  end.to_h
+    result << char
+  end
+
+  result
 end
 
-def validate_matches!(example, haystack, regexps, sets = nil, haystack_valid_utf8 = nil)
-  results = {}
+# unnamed or named capture groups, `\(` and `(?:` are not
+def capture_groups?(pattern)
+  pattern.match?(/(?<!\\)(?:\\\\)*\((?!\?)|\(\?P?<[a-zA-Z_]/)
+end
 
-  regexps&.each do |engine, group|
-    chosen_haystack =
-      if engine == :ruby
-        haystack_valid_utf8 || haystack
-      else
-        haystack
-      end
+def re2_options(example)
+  options = {}
+  options[:utf8] = false if example[:unicode] == false
+  options
+end
 
-    matches =
-      if group.is_a?(Array)
-        group
-          .map { |regexp| send("#{engine}_scan", chosen_haystack, regexp) }
-          .reject(&:empty?)
-      else
-        matches = send("#{engine}_scan", chosen_haystack, group)
-      end
+def rust_options(example)
+  options = {}
+  options[:unicode] = false if example[:unicode] == false
+  options
+end
 
-    validate!(matches, example, engine)
-    results[engine] = matches.flatten(1)
+def engine_options(engine, example)
+  engine_adapter(engine)[:options].call(example)
+end
+
+def compile_regexp(engine, pattern, example)
+  engine_adapter(engine)[:compile].call(pattern, engine_options(engine, example))
+end
+
+# NOTE:
+# - re2 does not raise on invalid patterns, it logs the error and returns a
+#   regexp that is not `ok?` (see `valid:` of its adapter)
+def compiles?(engine, pattern, example)
+  regexp = compile_regexp(engine, pattern, example)
+  valid = engine_adapter(engine)[:valid]
+  valid ? valid.call(regexp) : true
+rescue RegexpError, ArgumentError
+  false
+end
+
+def compile_set(engine, patterns, example)
+  engine_adapter(engine)[:compile].call(patterns, engine_options(engine, example))
+end
+
+def cached_regexp(engine, pattern, example)
+  cached(:regexp, [engine, pattern, engine_options(engine, example)]) do
+    compile_regexp(engine, pattern, example)
   end
+end
 
-  sets&.each do |engine, group|
-    original_engine = engine.to_s.gsub(/_set$/, '').to_sym
+def cached_set(engine, patterns, example)
+  cached(:set, [engine, patterns, engine_options(engine, example)]) do
+    compile_set(engine, patterns, example)
+  end
+end
 
-    matches =
-      if group.is_a?(Array)
-        group
-          .map { |set| send("#{engine}_scan", haystack, set, regexps[original_engine]) }
-          .reject(&:empty?)
+# NOTE:
+# - compile benchmarks must not use `cached: true`, they would time cache lookups
+def compile_regexps(patterns, example, cached: false)
+  compiler = cached ? method(:cached_regexp) : method(:compile_regexp)
+
+  patterns.to_h do |engine, pattern|
+    regexp =
+      if pattern.is_a?(Array)
+        pattern.map { compiler.call(engine, _1, example) }
       else
-        matches = send("#{engine}_scan", haystack, group, regexps[original_engine])
+        compiler.call(engine, pattern, example)
       end
 
+    [engine, regexp]
+  end
+end
+
+def rss_bytes
+  if File.exist?("/proc/self/status")
+    File.read("/proc/self/status")[/^VmRSS:\s+(\d+)/, 1].to_i * 1024
+  else
+    `ps -o rss= -p #{Process.pid}`.to_i * 1024
+  end
+end
+
+# NOTE:
+# - block is run once in a forked process, returns how much its peak RSS
+#   grew over the RSS it started with
+# - needs /proc (Linux), returns nil elsewhere
+def peak_rss_growth
+  return unless File.exist?("/proc/self/status")
+
+  reader, writer = IO.pipe
+
+  pid = fork do
+    reader.close
+    start = rss_bytes
+    yield
+    peak = File.read("/proc/self/status")[/^VmHWM:\s+(\d+)/, 1].to_i * 1024
+    writer.write(peak - start)
+  end
+
+  writer.close
+  growth = reader.read
+  Process.wait(pid)
+
+  growth.to_i if $?.success?
+end
+
+def validate_matches!(example, haystack, regexps, sets = nil, haystack_valid_utf8 = nil, engines: nil)
+  results = {}
+
+  scanners(regexps, sets).each do |engine, scanner|
+    next if engines && !engines.include?(engine)
+
+    matches = scanner.call(haystack, haystack_valid_utf8)
+    # rules matching nowhere are left out, as set engines do not return them
+    matches = matches.reject(&:empty?) if regexps[engine].is_a?(Array)
+
     validate!(matches, example, engine)
     results[engine] = matches.flatten(1)
   end
@@ -172,9 +455,11 @@ def validate_matches!(example, haystack, regexps, sets = nil, haystack_valid_utf
   # engines with specific match counts should not be compared
   engines_to_skip = example[:validations].values.flat_map(&:keys).uniq - [:*]
 
-  if results.except(*engines_to_skip).values.uniq.size != 1
+  if results.except(*engines_to_skip).values.uniq.size > 1
     raise "Results are different between engines"
   end
+
+  results
 end
 
 def validate!(matches, example, engine)
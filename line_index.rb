@@ -0,0 +1,100 @@
+# NOTE:
+# - index is persisted next to the data file as `<path>.lines` and rebuilt
+#   whenever size or mtime of the data file changes
+# - it keeps byte offsets of "\n" with trailing newlines excluded, so a slice
+#   is the same as `split("\n")[line_start...line_end].join("\n")`, which
+#   drops trailing empty lines
+LINE_INDEX_CHUNK_BYTES = 16 * 1024 * 1024
+
+def line_index_path(path)
+  "#{path}.lines"
+end
+
+def build_line_index(path)
+  newlines = []
+  offset = 0
+  buffer = String.new(capacity: LINE_INDEX_CHUNK_BYTES, encoding: Encoding::BINARY)
+
+  File.open(path, "rb") do |file|
+    while file.read(LINE_INDEX_CHUNK_BYTES, buffer)
+      position = 0
+
+      while (newline = buffer.index("\n", position))
+        newlines << offset + newline
+        position = newline + 1
+      end
+
+      offset += buffer.bytesize
+    end
+  end
+
+  content_bytes = offset
+  while newlines.last && newlines.last == content_bytes - 1
+    newlines.pop
+    content_bytes -= 1
+  end
+
+  stat = File.stat(path)
+
+  {
+    size: stat.size,
+    mtime: stat.mtime.to_r,
+    content_bytes: content_bytes,
+    newlines: newlines.pack("Q<*")
+  }
+end
+
+def load_line_index(path)
+  stat = File.stat(path)
+  index_path = line_index_path(path)
+
+  if File.exist?(index_path)
+    begin
+      index = Marshal.load(File.binread(index_path))
+      return index if index[:size] == stat.size && index[:mtime] == stat.mtime.to_r
+    rescue ArgumentError, TypeError, SystemCallError
+      # truncated or corrupt index, rebuilt below
+    end
+  end
+
+  index = build_line_index(path)
+  write_line_index(index_path, index)
+
+  index
+end
+
+# NOTE:
+# - written to a temporary file renamed into place, so `--jobs` children
+#   building the same index never read a half-written one
+def write_line_index(index_path, index)
+  temp_path = "#{index_path}.#{Process.pid}.tmp"
+
+  File.binwrite(temp_path, Marshal.dump(index))
+  File.rename(temp_path, index_path)
+rescue SystemCallError
+  # read-only data dir, index is rebuilt on every run
+  File.delete(temp_path) if File.exist?(temp_path)
+end
+
+def line_byte_range(index, line_start, line_end)
+  newlines = index[:newlines]
+  line_count = index[:content_bytes].zero? ? 0 : newlines.bytesize / 8 + 1
+
+  line_start ||= 0
+  line_end = [line_end || line_count, line_count].min
+  return 0...0 if line_start >= line_end
+
+  start = line_start.zero? ? 0 : newlines.unpack1("Q<", offset: (line_start - 1) * 8) + 1
+  finish = line_end == line_count ? index[:content_bytes] : newlines.unpack1("Q<", offset: (line_end - 1) * 8)
+
+  start...finish
+end
+
+def read_lines(path, line_start, line_end)
+  range = line_byte_range(load_line_index(path), line_start, line_end)
+
+  File.open(path, "rb") do |file|
+    file.seek(range.begin)
+    (file.read(range.size) || "").force_encoding(Encoding.default_external)
+  end
+end
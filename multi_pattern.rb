@@ -0,0 +1,204 @@
+# NOTE:
+# - compares single-pass scans returning `[regex_idx, start, end, ...]` (see
+#   `ruby_union_spans`/`re2_union_spans`) with scanning rule by rule: ruby
+#   scans every rule, sets match once and rescan every matched rule
+# - hit rate is the share of rules matching the haystack: real rules that
+#   match nowhere are replaced by `\b(word)\b` rules with words sampled from
+#   the haystack; real rules matching the haystack are left out, so the rate
+#   is exact
+# - union is not a drop-in replacement for rule by rule scans: it reports
+#   leftmost-first matches, so matches of one rule overlapping a match of
+#   another are lost; before the hit rate rows, the union of every
+#   compatible rule (including the ones matching the haystack) is compared
+#   with rule by rule scans and the lost matches are reported
+# - rule by rule rows are validated to be the same; union rows report the
+#   matches they miss (`missed_count`) or add (`extra_count`) instead, which
+#   stay 0 with the sampled words as distinct words never overlap
+# - rust/regex set rescans with `scan`, as rust_regexp has no API returning
+#   match positions, and has no union row for the same reason; such rows are
+#   not validated
+MULTI_PATTERN_HIT_RATES = [0.0, 0.1, 0.25, 0.5, 1.0].freeze
+
+def hit_rules(haystack, count, random: Random.new(42))
+  haystack.scan(/\b[a-z_]{6,}\b/).uniq.sample(count, random: random).map { "\\b(#{_1})\\b" }
+end
+
+# NOTE:
+# - rows come from adapters (see engines.rb): `union_spans:` of regexp
+#   engines scans the union, `rule_spans:` scans rule by rule, set engines
+#   without `rule_spans:` rescan with `scan`; every row scans `spans_haystack:`
+def multi_pattern_scanners(rules, example, engines)
+  patterns = rule_patterns(rules)
+  scanners = {}
+  binary_haystacks = {}.compare_by_identity
+
+  spans_scanner = lambda do |engine, &scan|
+    lambda do |haystack|
+      scan.call(engine_haystack(engine, haystack, haystack, :spans_haystack, binary_haystacks: binary_haystacks))
+    end
+  end
+
+  regexp_engines.intersection(engines).each do |engine|
+    adapter = engine_adapter(engine)
+
+    if (rule_spans = adapter[:rule_spans])
+      regexps = patterns[engine].map { compile_regexp(engine, _1, example) }
+      scanners[[engine, nil]] = spans_scanner.call(engine) { rule_spans.call(_1, regexps) }
+    end
+
+    if (union_spans = adapter[:union_spans])
+      union = compile_regexp(engine, union_pattern(patterns[engine]), example)
+      scanners[[engine, "union"]] = spans_scanner.call(engine) { union_spans.call(_1, union, rules.size) }
+    end
+  end
+
+  set_engines.intersection(engines).each do |engine|
+    adapter = engine_adapter(engine)
+    regexp_engine = adapter[:set_of]
+    set = compile_set(engine, patterns[regexp_engine], example)
+    regexps = patterns[regexp_engine].map { compile_regexp(regexp_engine, _1, example) }
+    rescan = adapter[:rule_spans] || adapter[:scan]
+
+    scanners[[engine, nil]] = spans_scanner.call(engine) { rescan.call(_1, set, regexps) }
+  end
+
+  scanners
+end
+
+def run_multi_pattern_example(title, example, engines: ENGINES, rules: nil)
+  rules_path = rules || example[:patterns_path]
+
+  unless rules_path
+    puts "\n-- [#{title}] multi-pattern: skipped, example has no rule file"
+    return
+  end
+
+  puts "\n-- [#{title}] multi-pattern (#{rules_path})"
+
+  # union spans are byte offsets of a valid UTF-8 haystack in every engine
+  haystack = valid_utf8_haystack(prepare_haystack(example))
+
+  all_rules = File.read(rules_path).split("\n")
+  compatible_rules = all_rules.select do |rule|
+    regexp_engines.all? { compiles?(_1, rule_patterns([rule])[_1].first, example) }
+  end
+
+  report_union_losses(title, compatible_rules, example, engines, haystack, rules_path)
+
+  real_rules = compatible_rules.reject { Regexp.new(_1).match?(haystack) }
+
+  puts "Left out #{all_rules.size - real_rules.size} rules matching the haystack or incompatible with some engine"
+  return if real_rules.empty?
+
+  labels = nil
+
+  MULTI_PATTERN_HIT_RATES.each do |hit_rate|
+    hit_count = (real_rules.size * hit_rate).round
+    rules = hit_rules(haystack, hit_count) + real_rules.drop(hit_count)
+
+    scanners = multi_pattern_scanners(rules, example, engines)
+    # rows of engines with spans, `scan` rescans return match strings
+    results = scanners.transform_values { _1.call(haystack) }
+    results.select! { |(engine, variant), _| variant || engine_adapter(engine)[:rule_spans] }
+
+    rule_spans = results.find { |(_, variant), _| variant.nil? }&.last
+    expected = rule_spans&.each_slice(3)&.sort
+    differences = {}
+
+    results.each do |(engine, variant), result|
+      next if expected.nil?
+
+      if variant == "union"
+        differences[[engine, variant]] = union_differences(rule_spans, result)
+        next
+      end
+
+      next if result.each_slice(3).sort == expected
+
+      raise "Rule spans of `#{ENGINE_LABELS.fetch(engine)}` are different from rule by rule scan"
+    end
+
+    unless labels
+      labels = scanners.keys
+      puts format("%8s %6s %10s %s", "hit rate", "rules", "matches", labels.map { |engine, variant| [ENGINE_LABELS.fetch(engine), variant].compact.join(" ").rjust(16) }.join)
+    end
+
+    times = scanners.transform_values { |scanner| measure_median { scanner.call(haystack) } }
+    match_count = expected ? expected.size : 0
+
+    times.each do |(engine, variant), time|
+      missed_count, extra_count = differences[[engine, variant]]
+
+      RESULTS << {
+        mode: "multi_pattern",
+        example: title,
+        engine: engine.to_s,
+        variant: variant,
+        label: [ENGINE_LABELS.fetch(engine), variant].compact.join(" "),
+        rules_path: rules_path,
+        hit_rate: hit_rate,
+        pattern_count: rules.size,
+        hit_count: hit_count,
+        match_count: match_count,
+        missed_count: missed_count,
+        extra_count: extra_count,
+        haystack_bytes: haystack.bytesize,
+        median_time: time,
+        bytes_per_sec: haystack.bytesize / time
+      }
+    end
+
+    puts format(
+      "%7.0f%% %6d %10d %s",
+      hit_rate * 100,
+      rules.size,
+      match_count,
+      labels.map { format("%9.1f MB/s", haystack.bytesize / times[_1] / 1_000_000.0).rjust(16) }.join
+    )
+
+    differences.each do |(engine, variant), (missed, extra)|
+      next if missed.zero? && extra.zero?
+
+      puts format("%16s missed %d and added %d of %d rule by rule matches", "#{ENGINE_LABELS.fetch(engine)} #{variant}", missed, extra, match_count)
+    end
+  end
+end
+
+# scans the union of every compatible rule, including the ones matching the
+# haystack, and reports matches lost to overlaps against rule by rule scans
+# of the first engine having them (union spans are byte offsets in every engine)
+def report_union_losses(title, rules, example, engines, haystack, rules_path)
+  patterns = rule_patterns(rules)
+  engines = regexp_engines.intersection(engines)
+
+  reference = engines.find { engine_adapter(_1)[:rule_spans] }
+  return unless reference
+
+  regexps = patterns[reference].map { compile_regexp(reference, _1, example) }
+  rule_spans = engine_adapter(reference)[:rule_spans].call(engine_haystack(reference, haystack, haystack, :spans_haystack), regexps)
+  match_count = rule_spans.size / 3
+
+  engines.each do |engine|
+    next unless (union_spans = engine_adapter(engine)[:union_spans])
+
+    union = compile_regexp(engine, union_pattern(patterns[engine]), example)
+    spans = union_spans.call(engine_haystack(engine, haystack, haystack, :spans_haystack), union, rules.size)
+    missed, extra = union_differences(rule_spans, spans)
+
+    RESULTS << {
+      mode: "multi_pattern_union",
+      example: title,
+      engine: engine.to_s,
+      rules_path: rules_path,
+      pattern_count: rules.size,
+      match_count: match_count,
+      missed_count: missed,
+      extra_count: extra
+    }
+
+    puts format(
+      "%s union of all %d compatible rules: missed %d and added %d of %d rule by rule matches",
+      ENGINE_LABELS.fetch(engine), rules.size, missed, extra, match_count
+    )
+  end
+end
@@ -0,0 +1,122 @@
+# NOTE:
+# - rules are taken from `--rules`, or from the full noseyparker rule file
+#   (PATTERN_COUNT_RULES) for examples with a rule file: their own ones are
+#   selections of 50 rules or fewer, which would end the real rule curve
+#   early; only rules that compile in every engine are used
+# - beyond the real rules, SYNTHETIC_RULE is filled with random keywords, which
+#   mimics the keyword + wide scope + token shape of noseyparker rules
+# - N grows as 1, 2, 4, ... up to `--max-rules`, the count of all real rules
+#   is always included
+# - compile time and scan time are medians (see `measure_median` in sweep.rb),
+#   memory is RSS growth per compiled copy (see `compile_memory` in compile.rb)
+# - every rule count is first scanned once under the `--timeout` budget (see
+#   guard.rb), engines over it are left out of larger counts
+PATTERN_COUNT_RULES = "./data/noseyparker/regexps.txt"
+PATTERN_COUNT_MAX_RULES = 256
+PATTERN_COUNT_MEMORY_COPIES = 3
+SYNTHETIC_RULE = '(?i)\b%s[_-]?(?:key|token|secret).{0,20}\b([a-z0-9]{32,40})\b'
+
+def synthetic_rules(count, random: Random.new(42))
+  Array.new(count) do
+    keyword = Array.new(8) { ("a".."z").to_a.sample(random: random) }.join
+    format(SYNTHETIC_RULE, keyword)
+  end
+end
+
+def pattern_counts(real_count, max_rules)
+  counts = [1]
+  counts << counts.last * 2 while counts.last * 2 <= max_rules
+  (counts + [real_count].select { _1 <= max_rules }).uniq.sort
+end
+
+def rule_compilers(patterns, example, engines)
+  compilers = {}
+
+  regexp_engines.intersection(engines).each do |engine|
+    compilers[engine] = -> { patterns.fetch(engine).map { compile_regexp(engine, _1, example) } }
+  end
+
+  set_engines.intersection(engines).each do |engine|
+    compilers[engine] = -> { compile_set(engine, patterns.fetch(engine_adapter(engine)[:set_of]), example) }
+  end
+
+  compilers
+end
+
+def run_pattern_count_example(title, example, engines: ENGINES, rules: nil, max_rules: PATTERN_COUNT_MAX_RULES, timeout: SCAN_TIMEOUT)
+  rules_path = rules || (PATTERN_COUNT_RULES if example[:patterns_path])
+
+  unless rules_path
+    puts "\n-- [#{title}] pattern count: skipped, example has no rule file"
+    return
+  end
+
+  puts "\n-- [#{title}] pattern count (#{rules_path})"
+
+  haystack = prepare_haystack(example)
+  haystack_valid_utf8 = valid_utf8_haystack(haystack)
+
+  real_rules, incompatible_rules = File.read(rules_path).split("\n").partition do |rule|
+    regexp_engines.all? do |engine|
+      compiles?(engine, engine_adapter(engine)[:pattern].call(rule), example)
+    end
+  end
+
+  puts "Skipped #{incompatible_rules.size} rules incompatible with some engine" if incompatible_rules.any?
+  puts "#{real_rules.size} real rules, synthetic ones beyond"
+
+  all_rules = real_rules + synthetic_rules([max_rules - real_rules.size, 0].max)
+  active_engines = engines.dup
+
+  puts format("%6s %-16s %14s %12s %14s", "rules", "engine", "compile", "memory", "scan")
+
+  pattern_counts(real_rules.size, max_rules).each do |count|
+    patterns = rule_patterns(all_rules.first(count))
+    compilers = rule_compilers(patterns, example, active_engines)
+    compiled = compilers.transform_values(&:call)
+
+    regexps = compiled.slice(*regexp_engines)
+    sets = compiled.slice(*set_engines)
+
+    # set scanners rescan with matched regexps, even when their engine is not selected
+    sets.each_key do |engine|
+      original_engine = engine_adapter(engine)[:set_of]
+      regexps[original_engine] ||= patterns.fetch(original_engine).map { compile_regexp(original_engine, _1, example) }
+    end
+
+    count_scanners = scanners(regexps, sets).slice(*compilers.keys)
+    guarded = guard_engines(title, example, count_scanners, haystack, haystack_valid_utf8, timeout: timeout, mode: "pattern_count", pattern_count: count)
+    (count_scanners.keys - guarded).each { active_engines.delete(_1) }
+
+    count_scanners.slice(*guarded).each do |engine, scanner|
+      compile_time = measure_median(&compilers.fetch(engine))
+      memory_bytes = compile_memory(copies: PATTERN_COUNT_MEMORY_COPIES, &compilers.fetch(engine))
+      scan_time = measure_median { scanner.call(haystack, haystack_valid_utf8) }
+
+      active_engines.delete(engine) if scan_time > SWEEP_TIME_LIMIT
+
+      RESULTS << {
+        mode: "pattern_count",
+        example: title,
+        engine: engine.to_s,
+        label: ENGINE_LABELS.fetch(engine),
+        pattern_count: count,
+        synthetic_count: [count - real_rules.size, 0].max,
+        compile_time: compile_time,
+        memory_bytes: memory_bytes,
+        median_time: scan_time,
+        haystack_bytes: haystack.bytesize,
+        bytes_per_sec: haystack.bytesize / scan_time
+      }
+
+      puts format(
+        "%6d %-16s %13.6fs %9.1f KB %9.1f MB/s",
+        count,
+        ENGINE_LABELS.fetch(engine),
+        compile_time,
+        memory_bytes / 1024.0,
+        haystack.bytesize / scan_time / 1_000_000.0
+      )
+    end
+  end
+end
@@ -0,0 +1,185 @@
+# NOTE:
+# - every rule is reduced to a factor: literals one of which must occur in
+#   every match, e.g. `AKIA` for `\b(AKIA[A-Z0-9]{16})\b` or `ghu`, `ghs`
+#   for `\b((?:ghu|ghs)_[a-zA-Z0-9]{36})\b`; the longest required literal run
+#   or group of literal alternatives is taken, optional parts are skipped
+# - literals of all rules go to a single set (one entry per rule), a set of
+#   literals is matched in a single pass (Aho-Corasick/Teddy in rust/regex),
+#   only rules with a hit are scanned with their full regexps
+# - rules with `(?i)` get case-insensitive literals, rules without a factor
+#   of at least PREFILTER_MIN_LITERAL_BYTES, or with `(?x)`, are always scanned
+PREFILTER_MIN_LITERAL_BYTES = 3
+PREFILTER_META_CHARS = ".\\+*?()|[]{}^$".chars.freeze
+PREFILTER_ESCAPES = { "t" => "\t", "n" => "\n", "r" => "\r", "f" => "\f", "v" => "\v" }.freeze
+
+def escape_literal(literal)
+  literal.each_char.map { PREFILTER_META_CHARS.include?(_1) ? "\\#{_1}" : _1 }.join
+end
+
+def factor_bytes(factor)
+  factor.map(&:bytesize).min
+end
+
+def parse_quantifier(rule, pos)
+  quantifier = rule[pos..].match(/\A(?:([?*+])|\{(\d+)(,(\d*))?\})[?+]?/)
+  return [nil, pos] unless quantifier
+
+  min =
+    if quantifier[1]
+      quantifier[1] == "+" ? 1 : 0
+    else
+      quantifier[2].to_i
+    end
+  max = quantifier[1] || quantifier[3] ? nil : min
+
+  [[min, max], pos + quantifier[0].size]
+end
+
+def skip_class(rule, pos)
+  class_start = pos
+  pos += 1
+  pos += 1 if rule[pos] == "^"
+  pos += 1 if rule[pos] == "]"
+
+  until rule[pos].nil? || rule[pos] == "]"
+    pos += rule[pos] == "\\" ? 2 : 1
+  end
+
+  raise ArgumentError, "unterminated class at #{class_start}" unless rule[pos]
+
+  pos + 1
+end
+
+# returns `[item, pos]`, item is a literal string, a factor array, or nil
+# for anything that matches no required literal
+def parse_item(rule, pos)
+  char = rule[pos]
+
+  case char
+  when "("
+    header = rule[pos..][/\A\((?:\?(?:[a-zA-Z-]*:|P?<[a-zA-Z_]\w*>|([=!]|<[=!])|[a-zA-Z-]*\)))?/]
+    pos += header.size
+
+    # flags group like `(?i)`, zero width, literal runs continue across it
+    return [:flags, pos] if header.end_with?(")")
+
+    factor, pos = parse_alternation(rule, pos)
+    raise ArgumentError, "unterminated group" unless rule[pos] == ")"
+
+    # lookarounds do not consume their literals
+    [header.match?(/\A\(\?<?[=!]/) ? nil : factor || [], pos + 1]
+  when "["
+    [nil, skip_class(rule, pos)]
+  when "\\"
+    escaped = rule[pos + 1]
+
+    if PREFILTER_ESCAPES.key?(escaped)
+      [PREFILTER_ESCAPES.fetch(escaped), pos + 2]
+    elsif escaped.match?(/[^a-zA-Z0-9]/)
+      [escaped, pos + 2]
+    elsif %w[p P x].include?(escaped) && rule[pos + 2] == "{"
+      [nil, rule.index("}", pos) + 1]
+    elsif escaped == "x"
+      [nil, pos + 4]
+    elsif %w[p P].include?(escaped)
+      [nil, pos + 3]
+    else
+      [nil, pos + 2]
+    end
+  when ".", "^", "$"
+    [nil, pos + 1]
+  else
+    [char, pos + 1]
+  end
+end
+
+def parse_sequence(rule, pos)
+  candidates = []
+  run = +""
+
+  until rule[pos].nil? || rule[pos] == ")" || rule[pos] == "|"
+    item, pos = parse_item(rule, pos)
+    next if item == :flags
+
+    quantifier, pos = parse_quantifier(rule, pos)
+    min, max = quantifier || [1, 1]
+
+    if item.is_a?(String) && min >= 1
+      run << item
+
+      next if max == 1
+    end
+
+    candidates << [run] unless run.empty?
+    run = +""
+
+    candidates << item if item.is_a?(Array) && item.any? && min >= 1
+  end
+
+  candidates << [run] unless run.empty?
+
+  [candidates.max_by { factor_bytes(_1) }, pos]
+end
+
+def parse_alternation(rule, pos)
+  factors = []
+
+  loop do
+    factor, pos = parse_sequence(rule, pos)
+    factors << factor
+    break unless rule[pos] == "|"
+
+    pos += 1
+  end
+
+  [factors.all? ? factors.flatten.uniq : nil, pos]
+end
+
+def required_literals(rule)
+  return if rule.include?("(?x")
+
+  factor, pos = parse_alternation(rule, 0)
+  return if pos != rule.size || factor.nil? || factor.empty?
+  return if factor_bytes(factor) < PREFILTER_MIN_LITERAL_BYTES
+
+  factor
+rescue ArgumentError
+  nil
+end
+
+def prefilter_pattern(rule, literals)
+  pattern = literals.map { escape_literal(_1) }.join("|")
+  rule.include?("(?i") ? "(?i)(?:#{pattern})" : pattern
+end
+
+# returns `[set, prefiltered rule indexes, always scanned rule indexes]`
+def prefilter(engine, rules, example)
+  literals = rules.map { required_literals(_1) }
+  prefiltered, always = rules.each_index.partition { literals[_1] }
+
+  patterns = prefiltered.map { prefilter_pattern(rules[_1], literals[_1]) }
+  set = cached_set(engine, patterns, example) if patterns.any?
+
+  [set, prefiltered, always]
+end
+
+def prefilter_regex_idxs(haystack, prefilter)
+  set, prefiltered, always = prefilter
+  hits = set ? set.match(haystack).map { prefiltered[_1] } : []
+
+  (hits + always).sort
+end
+
+def re2_set_prefilter_scan(haystack, prefilter, regexps)
+  prefilter_regex_idxs(haystack, prefilter).filter_map do |regex_idx|
+    matches = re2_scan(haystack, regexps[regex_idx])
+    matches unless matches.empty?
+  end
+end
+
+def rust_set_prefilter_scan(haystack, prefilter, regexps)
+  prefilter_regex_idxs(haystack, prefilter).filter_map do |regex_idx|
+    matches = rust_scan(haystack, regexps[regex_idx])
+    matches unless matches.empty?
+  end
+end
@@ -0,0 +1,180 @@
+# NOTE:
+# - adversarial inputs are `prefix + pump * n + suffix` of geometric lengths,
+#   e.g. `x=xxx...` for `.*.*=.*` (as in `cloudflare-redos/simplified-*`, which
+#   are two fixed points of that curve) or `aaa...!` for `(a+)+$`
+# - attack comes from the example (`adversarial: { prefix: "x=", pump: "x" }`),
+#   can be overridden with `--prefix`/`--pump`/`--suffix`, and defaults to
+#   REDOS_DEFAULT_ATTACK
+# - every length is first run once under REDOS_TIME_LIMIT in a forked child
+#   (see `guard.rb`), so exponential blow-ups do not hang the run; an engine
+#   over the limit is recorded as timed out and skipped for longer inputs
+# - SLO crossing is interpolated on log-log scale between the last length
+#   within the SLO and the first one over it
+# - engines whose pattern does not compile, or does not translate (see
+#   translate.rb), are reported and skipped
+REDOS_MIN_LENGTH = 8
+REDOS_MAX_LENGTH = 1024 * 1024
+REDOS_FACTOR = 2
+REDOS_TIME_LIMIT = 2.0
+REDOS_SLO_MS = 100.0
+REDOS_FIT_POINTS = 4
+REDOS_DEFAULT_ATTACK = { prefix: "", pump: "a", suffix: "!" }.freeze
+
+def pattern_example(pattern)
+  { pattern: pattern }
+end
+
+def adversarial_attack(example, attack)
+  REDOS_DEFAULT_ATTACK.merge(example.fetch(:adversarial, {}), attack)
+end
+
+def adversarial_lengths(max_length)
+  lengths = [REDOS_MIN_LENGTH]
+  lengths << lengths.last * REDOS_FACTOR while lengths.last * REDOS_FACTOR <= max_length
+  lengths
+end
+
+def adversarial_input(attack, length)
+  prefix, pump, suffix = attack.values_at(:prefix, :pump, :suffix)
+  count = [(length - prefix.size - suffix.size).fdiv(pump.size).ceil, 1].max
+
+  prefix + pump * count + suffix
+end
+
+# NOTE:
+# - linear, quadratic and cubic growth have a constant slope on log-log
+#   scale, exponential growth has a slope that keeps rising with length
+def growth_class(points, fit)
+  slopes = points.each_cons(2).map { |(x1, y1), (x2, y2)| Math.log(y2 / y1) / Math.log(x2.fdiv(x1)) }
+  rising = slopes.each_cons(2).all? { |a, b| b > a } && slopes.last > 2 * [slopes.first, 1.0].max
+
+  return "exponential" if rising || fit[:exponent] >= 3.5
+  return "linear" if fit[:exponent] < 1.5
+  return "quadratic" if fit[:exponent] < 2.5
+
+  "cubic"
+end
+
+def slo_crossing(points, slo)
+  over_idx = points.index { |_, time| time > slo }
+  return unless over_idx
+  return points[over_idx][0] if over_idx.zero?
+
+  (length1, time1), (length2, time2) = points[over_idx - 1], points[over_idx]
+  ratio = Math.log(slo / time1) / Math.log(time2 / time1)
+
+  (length1 * (length2.fdiv(length1)**ratio)).round
+end
+
+def run_redos_example(title, example, engines: ENGINES, max_bytes: REDOS_MAX_LENGTH, slo: REDOS_SLO_MS, attack: {})
+  attack = adversarial_attack(example, attack)
+  slo_seconds = slo / 1000.0
+
+  puts "\n-- [#{title}] redos (#{attack[:prefix].inspect} + #{attack[:pump].inspect} * n + #{attack[:suffix].inspect}, SLO #{slo}ms)"
+
+  # an invalid regexp (raising, or re2 not `ok?`) would be benchmarked as if
+  # it failed fast on every input
+  patterns = example_patterns(example).slice(*engines)
+  valid_patterns = patterns.select { |engine, pattern| Array(pattern).all? { compiles?(engine, _1, example) } }
+
+  # canonical `pattern:` examples have no pattern for engines it does not translate to
+  (engines & regexp_engines).reject { valid_patterns.key?(_1) }.each do |engine|
+    reason = patterns.key?(engine) ? "pattern does not compile" : "pattern does not translate"
+    puts format("%20s  skipped, %s", ENGINE_LABELS.fetch(engine), reason)
+  end
+
+  scanners = scanners(compile_regexps(valid_patterns, example, cached: true))
+  points = scanners.keys.to_h { [_1, []] }
+  timeouts = {}
+
+  # `*` marks times over the SLO
+  puts format("%10s %s", "length", scanners.keys.map { ENGINE_LABELS.fetch(_1).rjust(16) }.join)
+
+  adversarial_lengths(max_bytes).each do |length|
+    break if scanners.empty?
+
+    input = adversarial_input(attack, length)
+    input_valid_utf8 = valid_utf8_haystack(input)
+    times = {}
+
+    scanners.each do |engine, scanner|
+      status = run_with_watchdog(REDOS_TIME_LIMIT, regexp_timeout: engine_supports?(engine, :regexp_timeout) ? REDOS_TIME_LIMIT : nil) do
+        scanner.call(input, input_valid_utf8)
+      end
+
+      if status == :ok
+        times[engine] = measure_median { scanner.call(input, input_valid_utf8) }
+        points[engine] << [input.size, times[engine]]
+      else
+        times[engine] = :timed_out
+        timeouts[engine] = input.size
+      end
+
+      RESULTS << {
+        mode: "redos",
+        example: title,
+        engine: engine.to_s,
+        label: ENGINE_LABELS.fetch(engine),
+        input_length: input.size,
+        timed_out: status != :ok,
+        median_time: status == :ok ? times[engine] : nil,
+        over_slo: status != :ok || times[engine] > slo_seconds
+      }
+    end
+
+    times.each { |engine, time| scanners.delete(engine) if time == :timed_out || time > REDOS_TIME_LIMIT }
+
+    cells = points.keys.map do |engine|
+      time = times[engine]
+
+      cell =
+        if time.nil?
+          "-"
+        elsif time == :timed_out
+          "timed out"
+        else
+          format("%.6fs%s", time, time > slo_seconds ? "*" : " ")
+        end
+
+      cell.rjust(16)
+    end
+
+    puts format("%10d %s", input.size, cells.join)
+  end
+
+  puts "Growth:"
+
+  points.each do |engine, engine_points|
+    # a timed out length is over the SLO too
+    crossing = slo_crossing(engine_points, slo_seconds) || timeouts[engine]
+
+    if engine_points.size < 2
+      puts format("%20s  timed out at %d chars", ENGINE_LABELS.fetch(engine), timeouts[engine]) if timeouts[engine]
+      next
+    end
+
+    fit_points = engine_points.last(REDOS_FIT_POINTS)
+    fit = fit_complexity(fit_points)
+    growth = growth_class(fit_points, fit)
+
+    RESULTS << {
+      mode: "redos_fit",
+      example: title,
+      engine: engine.to_s,
+      label: ENGINE_LABELS.fetch(engine),
+      growth: growth,
+      slo_ms: slo,
+      slo_crossing_length: crossing,
+      **fit
+    }
+
+    puts format(
+      "%20s  %-11s time ~ n^%.2f (steepest n^%.2f), %s",
+      ENGINE_LABELS.fetch(engine),
+      growth,
+      fit[:exponent],
+      fit[:max_slope],
+      crossing ? "over SLO at ~#{crossing} chars" : "within SLO up to #{engine_points.last[0]} chars"
+    )
+  end
+end
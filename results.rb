@@ -0,0 +1,132 @@
+require "csv"
+require "etc"
+require "json"
+require "time"
+
+# NOTE:
+# - one record per (mode, example, engine), collected during the run and written
+#   once at the end, see `write_results`
+RESULTS = []
+
+def median(values)
+  sorted = values.sort
+  mid = sorted.size / 2
+
+  sorted.size.odd? ? sorted[mid] : (sorted[mid - 1] + sorted[mid]) / 2.0
+end
+
+# NOTE:
+# - `ips`/`ips_sd` are the same numbers benchmark-ips prints
+# - `mean_time` is the total measured time divided by iterations (seconds)
+# - `median_time` is taken from the per-cycle samples benchmark-ips collects (seconds)
+def entry_stats(entry)
+  {
+    label: entry.label,
+    ips: entry.ips,
+    ips_sd: entry.ips_sd,
+    mean_time: entry.microseconds.to_f / entry.iterations / 1_000_000,
+    median_time: 1.0 / median(entry.stats.samples),
+    iterations: entry.iterations
+  }
+end
+
+def record_result(mode:, example:, engine:, entry:, **fields)
+  record = {
+    mode: mode,
+    example: example,
+    engine: engine.to_s,
+    **entry_stats(entry),
+    **fields
+  }
+
+  RESULTS << record
+  record
+end
+
+# NOTE:
+# - `bytes_per_sec`/`matches_per_sec` are `ips` scaled by haystack size and
+#   match count, so they can be compared across examples
+def record_scan_result(example:, engine:, entry:, haystack_bytes:, match_count:, variant: nil)
+  record_result(
+    mode: "scan",
+    example: example,
+    engine: engine,
+    entry: entry,
+    variant: variant,
+    haystack_bytes: haystack_bytes,
+    match_count: match_count,
+    bytes_per_sec: entry.ips * haystack_bytes,
+    matches_per_sec: entry.ips * match_count
+  )
+end
+
+def humanize(number)
+  scale, unit = [[1e9, "G"], [1e6, "M"], [1e3, "k"]].find { |scale, _| number.abs >= scale } || [1, ""]
+
+  format("%.2f%s", number / scale, unit)
+end
+
+def print_throughput(records)
+  puts "Throughput:"
+
+  records.each do |record|
+    puts format(
+      "%20s %12.1f MB/s %14s",
+      record[:label],
+      record[:bytes_per_sec] / 1_000_000.0,
+      "#{humanize(record[:matches_per_sec])} matches/s"
+    )
+  end
+end
+
+def gem_version(name)
+  Gem.loaded_specs[name]&.version&.to_s
+end
+
+def cpu_model
+  if File.exist?("/proc/cpuinfo")
+    File.foreach("/proc/cpuinfo").find { _1.start_with?("model name") }&.split(":", 2)&.last&.strip
+  else
+    `sysctl -n machdep.cpu.brand_string 2>/dev/null`.strip
+  end
+end
+
+def git_revision
+  `git rev-parse --short HEAD 2>/dev/null`.strip
+end
+
+def environment_metadata
+  {
+    time: Time.now.utc.iso8601,
+    ruby: RUBY_DESCRIPTION,
+    platform: RUBY_PLATFORM,
+    cpu: cpu_model,
+    cpus: Etc.nprocessors,
+    benchmark_ips: gem_version("benchmark-ips"),
+    re2: gem_version("re2"),
+    rust_regexp: gem_version("rust_regexp"),
+    revision: git_revision
+  }
+end
+
+def write_results(path, results = RESULTS)
+  environment = environment_metadata
+
+  case File.extname(path)
+  when ".json"
+    File.write(path, JSON.pretty_generate(environment: environment, results: results))
+  when ".csv"
+    # records of different modes have different fields
+    fields = results.flat_map(&:keys).uniq
+
+    CSV.open(path, "w") do |csv|
+      csv << fields + environment.keys
+
+      results.each do |record|
+        csv << record.values_at(*fields) + environment.values
+      end
+    end
+  else
+    raise ArgumentError, "unknown results format: #{path}, expected .json or .csv"
+  end
+end
@@ -0,0 +1,164 @@
+# NOTE:
+# - every rule of a rule file (`--rules` or the example's own one) is
+#   compiled and scanned on its own, rules are ranked by their share of the
+#   summed scan time and compile time of an engine
+# - a rule incompatible with an engine is reported as skipped for it
+# - wide scopes: `\w`, `\d`, `\s`, `\b`, `.` or negated classes like
+#   `[^a-zA-Z0-9_-]` inside non-capturing groups, which make rust set slow
+#   (see notes in 07_noseyparker.rb); constructs are found statically, and
+#   the cost is measured as the time of a single-rule set match over the
+#   time of a scan with the same rule, for the set engine with
+#   `:wide_scope_slowdown` capability (rust set)
+# - a rule is flagged as wide scope when that slowdown is at least
+#   WIDE_SCOPE_SLOWDOWN, or when it has wide scope constructs and no such
+#   set engine is selected
+WIDE_SCOPE_SLOWDOWN = 4.0
+WIDE_SCOPE_ESCAPES = %w[w W d D s S b B].freeze
+
+def wide_scope_constructs(rule)
+  constructs = []
+  groups = []
+  class_start = nil
+  escaped = false
+
+  rule.each_char.with_index do |char, index|
+    in_non_capturing = groups.include?(:non_capturing)
+
+    if escaped
+      escaped = false
+      constructs << "\\#{char}" if in_non_capturing && !class_start && WIDE_SCOPE_ESCAPES.include?(char)
+    elsif char == "\\"
+      escaped = true
+    elsif class_start
+      # `]` right after `[` or `[^` is a literal
+      if char == "]" && index > class_start + (rule[class_start + 1] == "^" ? 2 : 1)
+        constructs << rule[class_start..index] if in_non_capturing && rule[class_start + 1] == "^"
+        class_start = nil
+      end
+    elsif char == "["
+      class_start = index
+    elsif char == "("
+      groups << (rule[index + 1, 2] == "?:" ? :non_capturing : :other)
+    elsif char == ")"
+      groups.pop
+    elsif char == "."
+      constructs << char if in_non_capturing
+    end
+  end
+
+  constructs.uniq
+end
+
+def rule_profile_rules(rules_path, example)
+  File.read(rules_path).split("\n").map do |rule|
+    patterns = rule_patterns([rule]).transform_values(&:first)
+    compatible = patterns.select { |engine, pattern| compiles?(engine, pattern, example) }
+
+    { rule: rule, patterns: patterns.slice(*compatible.keys) }
+  end
+end
+
+def rule_set_slowdown(set_engine, rule, example, haystack, haystack_valid_utf8)
+  regexp_engine = engine_adapter(set_engine)[:set_of]
+  pattern = rule[:patterns][regexp_engine]
+  return unless pattern
+
+  set = compile_set(set_engine, [pattern], example)
+  set_haystack = engine_haystack(set_engine, haystack, haystack_valid_utf8)
+  scanner = scanners({ regexp_engine => compile_regexp(regexp_engine, pattern, example) }).fetch(regexp_engine)
+
+  set_time = measure_median { set.match(set_haystack) }
+  scan_time = measure_median { scanner.call(haystack, haystack_valid_utf8) }
+
+  set_time / scan_time
+end
+
+def run_rule_profile_example(title, example, engines: ENGINES, rules: nil)
+  rules_path = rules || example[:patterns_path]
+
+  unless rules_path
+    puts "\n-- [#{title}] rule profile: skipped, example has no rule file"
+    return
+  end
+
+  puts "\n-- [#{title}] rule profile (#{rules_path})"
+
+  haystack = prepare_haystack(example)
+  haystack_valid_utf8 = valid_utf8_haystack(haystack)
+  rule_engines = regexp_engines.intersection(engines)
+  slowdown_engine = set_engines.intersection(engines).find { engine_supports?(_1, :wide_scope_slowdown) }
+
+  profiles = rule_profile_rules(rules_path, example).each_with_index.map do |rule, idx|
+    constructs = wide_scope_constructs(rule[:rule])
+    slowdown = rule_set_slowdown(slowdown_engine, rule, example, haystack, haystack_valid_utf8) if slowdown_engine
+
+    wide_scope = slowdown ? slowdown >= WIDE_SCOPE_SLOWDOWN : constructs.any?
+
+    times = rule_engines.filter_map do |engine|
+      pattern = rule[:patterns][engine]
+      next unless pattern
+
+      regexp = compile_regexp(engine, pattern, example)
+      scanner = scanners({ engine => regexp }).fetch(engine)
+
+      [
+        engine,
+        {
+          compile_time: measure_median { compile_regexp(engine, pattern, example) },
+          scan_time: measure_median { scanner.call(haystack, haystack_valid_utf8) }
+        }
+      ]
+    end.to_h
+
+    rule.merge(index: idx, constructs: constructs, set_slowdown: slowdown, wide_scope: wide_scope, times: times)
+  end
+
+  rule_engines.each do |engine|
+    measured, skipped = profiles.partition { _1[:times].key?(engine) }
+
+    total_scan_time = measured.sum { _1[:times][engine][:scan_time] }
+    total_compile_time = measured.sum { _1[:times][engine][:compile_time] }
+
+    puts "\n#{ENGINE_LABELS.fetch(engine)}: #{measured.size} rules, #{format("%.6f", total_scan_time)}s scan, #{format("%.6f", total_compile_time)}s compile"
+    puts "Skipped rules incompatible with #{ENGINE_LABELS.fetch(engine)}: #{skipped.map { _1[:index] + 1 }.join(", ")}" if skipped.any?
+    puts format("%4s %4s %8s %12s %9s %12s %9s  %-4s %s", "rank", "rule", "scan %", "scan", "compile %", "compile", "set x", "wide", "pattern")
+
+    measured.sort_by { -_1[:times][engine][:scan_time] }.each.with_index(1) do |profile, rank|
+      times = profile[:times][engine]
+      scan_share = times[:scan_time] / total_scan_time
+      compile_share = times[:compile_time] / total_compile_time
+
+      RESULTS << {
+        mode: "rule_profile",
+        example: title,
+        engine: engine.to_s,
+        label: ENGINE_LABELS.fetch(engine),
+        rules_path: rules_path,
+        rule_index: profile[:index],
+        rule: profile[:rule],
+        rank: rank,
+        haystack_bytes: haystack.bytesize,
+        median_time: times[:scan_time],
+        scan_share: scan_share,
+        compile_time: times[:compile_time],
+        compile_share: compile_share,
+        set_slowdown: profile[:set_slowdown],
+        wide_scope: profile[:wide_scope],
+        wide_scope_constructs: profile[:constructs].join(" ")
+      }
+
+      puts format(
+        "%4d %4d %7.1f%% %11.6fs %8.1f%% %11.6fs %9s  %-4s %s",
+        rank,
+        profile[:index] + 1,
+        scan_share * 100,
+        times[:scan_time],
+        compile_share * 100,
+        times[:compile_time],
+        profile[:set_slowdown] ? format("%.1fx", profile[:set_slowdown]) : "-",
+        profile[:wide_scope] ? "yes" : "",
+        profile[:rule].length > 60 ? "#{profile[:rule][0, 57]}..." : profile[:rule]
+      )
+    end
+  end
+end
@@ -0,0 +1,26 @@
+require_relative "runner"
+
+# NOTE:
+# - data paths in examples are relative to the repo root
+Dir.chdir(__dir__)
+
+Dir["0*.rb"].sort.each { require_relative _1 }
+
+options = parse_options(ARGV)
+
+if options[:pattern]
+  raise ArgumentError, "--pattern works with --mode redos or analyze only" unless %w[redos analyze].include?(options[:mode])
+
+  examples = { "pattern" => pattern_example(options[:pattern]) }
+else
+  examples = select_examples(options[:examples])
+end
+
+if options[:list]
+  puts examples.keys
+else
+  engines = select_engines(options[:engines])
+  run_examples(examples, mode: options[:mode], engines: engines, jobs: options[:jobs], **options[:mode_options])
+  print_cache_stats
+  write_results(options[:output]) if options[:output]
+end
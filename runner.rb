@@ -0,0 +1,327 @@
+require "benchmark/ips"
+require "fileutils"
+require "optparse"
+require "tempfile"
+require "tmpdir"
+require "re2"
+require "rust_regexp"
+
+require_relative "helpers"
+require_relative "engines"
+require_relative "results"
+require_relative "prefilter"
+require_relative "trie"
+require_relative "translate"
+require_relative "fold"
+require_relative "guard"
+require_relative "variants"
+require_relative "compile"
+require_relative "sweep"
+require_relative "unicode"
+require_relative "redos"
+require_relative "analyze"
+require_relative "pattern_count"
+require_relative "stream"
+require_relative "binary"
+require_relative "rule_profile"
+require_relative "triage"
+require_relative "multi_pattern"
+
+# NOTE:
+# - every numbered script registers its examples here, so they can be run
+#   standalone (`ruby 01_literal.rb`) or all together via `ruby run.rb`
+EXAMPLES = {}
+
+# NOTE:
+# - every mode is a method called with `(title, example, engines:, **mode_options)` per example
+MODES = {
+  "scan" => :run_example,
+  "compile" => :run_compile_example,
+  "sweep" => :run_sweep_example,
+  "unicode" => :run_unicode_example,
+  "redos" => :run_redos_example,
+  "analyze" => :run_analyze_example,
+  "pattern-count" => :run_pattern_count_example,
+  "stream" => :run_stream_example,
+  "binary" => :run_binary_example,
+  "rule-profile" => :run_rule_profile_example,
+  "triage" => :run_triage_example,
+  "multi-pattern" => :run_multi_pattern_example
+}
+
+def register_examples(examples)
+  examples.each do |title, example|
+    raise ArgumentError, "example `#{title}` is already registered" if EXAMPLES.key?(title)
+
+    EXAMPLES[title] = example
+  end
+
+  examples
+end
+
+def fnmatch_any?(globs, name)
+  globs.any? { |glob| File.fnmatch(glob, name, File::FNM_EXTGLOB) }
+end
+
+def select_examples(globs)
+  return EXAMPLES if globs.empty?
+
+  selected = EXAMPLES.select { |title, _| fnmatch_any?(globs, title) }
+  raise ArgumentError, "no examples match #{globs.join(", ")}" if selected.empty?
+
+  selected
+end
+
+def select_engines(globs)
+  return ENGINES if globs.empty?
+
+  selected = ENGINES.select do |engine|
+    fnmatch_any?(globs, engine.to_s) || fnmatch_any?(globs, ENGINE_LABELS[engine])
+  end
+  raise ArgumentError, "no engines match #{globs.join(", ")}" if selected.empty?
+
+  selected
+end
+
+def run_example(title, example, engines: ENGINES, variants: [], timeout: SCAN_TIMEOUT)
+  puts "\n-- [#{title}]"
+
+  variants |= example.fetch(:variants, [])
+
+  haystack = prepare_haystack(example)
+  haystack_valid_utf8 = valid_utf8_haystack(haystack)
+
+  regexps = prepare_regexps(example)
+  sets = prepare_sets(example).slice(*engines) if example[:patterns_path]
+
+  engines = guard_engines(title, example, scanners(regexps, sets).slice(*engines), haystack, haystack_valid_utf8, timeout: timeout)
+  sets = sets&.slice(*engines)
+  return if engines.empty?
+
+  matches = validate_matches!(example, haystack, regexps, sets, haystack_valid_utf8, engines: engines)
+
+  reports = {}
+
+  scanners(regexps, sets).slice(*engines).each do |engine, scanner|
+    reports[[engine, nil]] = -> { scanner.call(haystack, haystack_valid_utf8) }
+  end
+
+  variants.each do |variant|
+    variant_scanners = send(VARIANTS.fetch(variant), example, regexps, sets).slice(*engines)
+    variant_engines = guard_engines(title, example, variant_scanners, haystack, haystack_valid_utf8, timeout: timeout, variant: variant)
+    variant_scanners = variant_scanners.slice(*variant_engines)
+    results = variant_scanners.transform_values { _1.call(haystack, haystack_valid_utf8) }
+
+    validate_variant!(variant, example, haystack, results, matches)
+
+    variant_scanners.each do |engine, scanner|
+      reports[[engine, variant]] = -> { scanner.call(haystack, haystack_valid_utf8) }
+    end
+  end
+
+  report = Benchmark.ips do |x|
+    reports.each do |(engine, variant), block|
+      x.report([ENGINE_LABELS.fetch(engine), variant].compact.join(" "), &block)
+    end
+
+    x.compare!
+  end
+
+  records = reports.keys.zip(report.entries).map do |(engine, variant), entry|
+    record_scan_result(
+      example: title,
+      engine: engine,
+      variant: variant,
+      entry: entry,
+      haystack_bytes: haystack.bytesize,
+      match_count: matches.fetch(engine).size
+    )
+  end
+
+  print_throughput(records)
+end
+
+def run_examples(examples, mode: "scan", engines: ENGINES, jobs: 1, **mode_options)
+  runner = MODES.fetch(mode) { raise ArgumentError, "unknown mode: #{mode}" }
+
+  # options of other modes are ignored
+  accepted_options = method(runner).parameters.filter_map { |type, name| name if type == :key }
+  mode_options = mode_options.slice(*accepted_options)
+
+  return run_examples_parallel(examples, runner: runner, engines: engines, jobs: jobs, **mode_options) if jobs > 1
+
+  # a failing example does not stop the others, as with `--jobs` above 1
+  failed = []
+
+  examples.each do |title, example|
+    send(runner, title, example, engines: engines, **mode_options)
+  rescue StandardError => e
+    warn e.full_message
+    failed << title
+  end
+
+  raise "Failed examples: #{failed.join(", ")}" if failed.any?
+end
+
+# NOTE:
+# - examples are forked into separate processes, output of each one is
+#   buffered and printed as a whole in the registry order
+# - parallel runs share CPU and memory bandwidth, so absolute numbers are
+#   only comparable with runs made with the same `--jobs`
+def run_examples_parallel(examples, runner:, engines:, jobs:, **mode_options)
+  queue = examples.to_a
+  running = {}
+  outputs = {}
+  failed = []
+
+  until queue.empty? && running.empty?
+    while running.size < jobs && (title, example = queue.shift)
+      output = Tempfile.new("regexp-bench")
+      state = Tempfile.new("regexp-bench-state")
+
+      pid = fork do
+        $stdout.reopen(output)
+        $stderr.reopen(output)
+        send(runner, title, example, engines: engines, **mode_options)
+        File.binwrite(state.path, Marshal.dump([RESULTS, cache_stats]))
+      end
+
+      running[pid] = [title, output, state]
+    end
+
+    pid, status = Process.wait2
+    title, output, state = running.delete(pid)
+    failed << title unless status.success?
+    outputs[title] = [output, state]
+  end
+
+  examples.each_key do |title|
+    output, state = outputs.fetch(title)
+    $stdout.write(File.read(output.path))
+
+    if state.size > 0
+      child_results, child_cache_stats = Marshal.load(File.binread(state.path))
+      RESULTS.concat(child_results)
+      merge_cache_stats(child_cache_stats)
+    end
+
+    output.close!
+    state.close!
+  end
+
+  raise "Failed examples: #{failed.join(", ")}" if failed.any?
+end
+
+BYTE_UNITS = {
+  "" => 1,
+  "K" => 1024,
+  "M" => 1024**2,
+  "G" => 1024**3
+}
+
+def parse_bytes(size)
+  number, unit = size.upcase.match(/\A(\d+)([KMG]?)B?\z/)&.captures
+  raise OptionParser::InvalidArgument, size unless number
+
+  number.to_i * BYTE_UNITS.fetch(unit)
+end
+
+def parse_options(argv)
+  options = {
+    examples: [],
+    engines: [],
+    mode: "scan",
+    jobs: 1,
+    output: nil,
+    pattern: nil,
+    list: false,
+    mode_options: {}
+  }
+
+  parser = OptionParser.new do |opts|
+    opts.banner = "Usage: ruby run.rb [options] [EXAMPLE_GLOB...]"
+
+    opts.on("-e", "--example GLOB", "Run examples matching the glob, e.g. `literal/*` (repeatable)") do |glob|
+      options[:examples] << glob
+    end
+
+    opts.on("-E", "--engine GLOB", "Run engines matching the glob, e.g. `rust*` (repeatable)") do |glob|
+      options[:engines] << glob
+    end
+
+    opts.on("-m", "--mode MODE", MODES.keys, "Benchmark mode: #{MODES.keys.join(", ")} (default: scan)") do |mode|
+      options[:mode] = mode
+    end
+
+    opts.on("-V", "--variant NAME", VARIANTS.keys, "Add benchmark rows of a scan variant: #{VARIANTS.keys.join(", ")} (repeatable)") do |variant|
+      options[:mode_options][:variants] ||= []
+      options[:mode_options][:variants] << variant
+    end
+
+    opts.on("--timeout SECONDS", Float, "Time budget of a single scan per engine in scan, sweep and pattern-count modes, engines over it are recorded as timed out (default: 10, 0 turns it off)") do |timeout|
+      options[:mode_options][:timeout] = timeout
+    end
+
+    opts.on("--max-bytes SIZE", "Largest haystack for sweep mode, e.g. 16M (default: 256M), or adversarial input for redos mode (default: 1M)") do |size|
+      options[:mode_options][:max_bytes] = parse_bytes(size)
+    end
+
+    opts.on("--pattern REGEXP", "Run redos or analyze mode on REGEXP (rust syntax, translated for other engines) instead of registered examples") do |pattern|
+      options[:pattern] = pattern
+    end
+
+    %i[prefix pump suffix].each do |part|
+      opts.on("--#{part} STRING", "#{part.capitalize} of adversarial inputs in redos mode (default: from the example, or #{REDOS_DEFAULT_ATTACK.fetch(part).inspect})") do |string|
+        options[:mode_options][:attack] ||= {}
+        options[:mode_options][:attack][part] = string
+      end
+    end
+
+    opts.on("--confirm", "Confirm findings of analyze mode with a short adversarial ruby benchmark") do
+      options[:mode_options][:confirm] = true
+    end
+
+    opts.on("--slo MS", Float, "Latency SLO of a single scan in redos mode, in ms (default: 100)") do |slo|
+      options[:mode_options][:slo] = slo
+    end
+
+    opts.on("--rules PATH", "Rule file for pattern-count, rule-profile, triage, multi-pattern and analyze modes (default: rule file of the example, full noseyparker rule file for pattern-count)") do |path|
+      options[:mode_options][:rules] = path
+    end
+
+    opts.on("--max-rules N", Integer, "Largest rule count for pattern-count mode, synthetic rules are added beyond the real ones (default: 256)") do |count|
+      options[:mode_options][:max_rules] = count
+    end
+
+    opts.on("--budget MS", Float, "Summed scan cost of the fast rule subset in triage mode, in ms per MB (default: 100)") do |budget|
+      options[:mode_options][:budget] = budget
+    end
+
+    opts.on("--triage-dir DIR", "Directory for rule files written by triage mode (default: #{TRIAGE_DIR})") do |dir|
+      options[:mode_options][:triage_dir] = dir
+    end
+
+    opts.on("--chunk-bytes SIZE", "Chunk size for stream mode, e.g. 4M (default: 1M)") do |size|
+      options[:mode_options][:chunk_bytes] = parse_bytes(size)
+    end
+
+    opts.on("--overlap SIZE", "Bytes carried between chunks in stream mode, must exceed the longest match (default: 64K)") do |size|
+      options[:mode_options][:overlap] = parse_bytes(size)
+    end
+
+    opts.on("-j", "--jobs N", Integer, "Run N examples in parallel") do |jobs|
+      options[:jobs] = jobs
+    end
+
+    opts.on("-o", "--output PATH", "Write results to PATH (.json or .csv)") do |path|
+      options[:output] = path
+    end
+
+    opts.on("-l", "--list", "List registered examples and exit") do
+      options[:list] = true
+    end
+  end
+
+  options[:examples].concat(parser.parse(argv))
+  options
+end
@@ -0,0 +1,269 @@
+# NOTE:
+# - haystack file is read in chunks of `--chunk-bytes`, extended to the end
+#   of line, so chunks never split a line (or a UTF-8 character)
+# - lines covering at least `--overlap` bytes are carried over to the next
+#   chunk, a match is accepted only when it starts before the carried part,
+#   or in the last chunk; matches must be shorter than the overlap
+# - ruby and re2 continue scanning from the exact position where the
+#   previous chunk stopped, with carried lines and the newline before them
+#   as left context for `\b` and lookbehinds; lookbehinds reaching further
+#   back than that newline may still see less than in a whole-buffer scan,
+#   such differences are reported, not raised
+# - rust_regexp has no API returning match positions, see `rust_search_spans`
+# - ruby scans chunks scrubbed of invalid UTF-8, so its offsets are into the
+#   scrubbed haystack, as in the in-memory benchmarks
+# - every chunk is scanned as a text of its own, so start of text anchors
+#   (`\A`, `\G`, and `^` of rust and re2 outside of `(?m)`) would match again
+#   at every chunk start: patterns with them are left out of stream mode;
+#   end of text anchors (`\z`, `\Z`, `$` of rust and re2) match at every chunk
+#   end, so their matches reaching the end of a chunk are accepted in the
+#   last chunk only, earlier ones are in the carried part and found again;
+#   engines recovering positions from match strings (`rust_search_spans`)
+#   cannot tell where an anchored match is, so they leave out both
+STREAM_CHUNK_BYTES = 1024 * 1024
+STREAM_OVERLAP_BYTES = 64 * 1024
+
+# NOTE:
+# - regexp must be compiled without captures, so scan returns whole matches
+# - positions are recovered by searching every match string after the
+#   previous match, chunk is scanned from its first line; this is exact for
+#   patterns that do not match across lines and are not rejected by `\b` or
+#   lookarounds at an earlier occurrence of the same text
+def rust_search_spans(haystack, regexp, start = 0)
+  spans = []
+  position = 0
+  binary_haystack = haystack.b
+
+  regexp.scan(haystack).each do |match|
+    match_start = binary_haystack.byteindex(match.b, position)
+    position = match_start + match.bytesize
+
+    spans << match_start << position if match_start >= start
+  end
+
+  spans
+end
+
+# returns `[start anchored, end anchored]` of a pattern in `syntax` of an
+# engine adapter, line anchors of ruby and of `(?m)` patterns do not count
+def text_anchors(pattern, syntax)
+  multiline = syntax == :ruby || pattern[/\A\(\?([a-zA-Z]*)[:)]/, 1].to_s.include?("m")
+  start_anchored = end_anchored = false
+  pos = 0
+
+  while pos < pattern.size
+    case pattern[pos]
+    when "\\"
+      start_anchored ||= "AG".include?(pattern[pos + 1].to_s)
+      end_anchored ||= "zZ".include?(pattern[pos + 1].to_s)
+      pos += 2
+      next
+    when "["
+      pos = skip_class(pattern, pos)
+      next
+    when "^"
+      start_anchored ||= !multiline
+    when "$"
+      end_anchored ||= !multiline
+    end
+
+    pos += 1
+  end
+
+  [start_anchored, end_anchored]
+end
+
+def haystack_byte_range(example)
+  path = example[:haystack].fetch(:path)
+  line_start = example.dig(:haystack, :line_start)
+  line_end = example.dig(:haystack, :line_end)
+
+  if line_start || line_end
+    line_byte_range(load_line_index(path), line_start, line_end)
+  else
+    0...File.size(path)
+  end
+end
+
+def read_chunk(file, remaining, chunk_bytes)
+  chunk = file.read([chunk_bytes, remaining].min) || "".b
+  rest = file.gets("\n", remaining - chunk.bytesize) unless chunk.bytesize == remaining || chunk.end_with?("\n")
+
+  rest ? chunk << rest : chunk
+end
+
+# NOTE:
+# - chunk is encoded as `spans_haystack:` of the engine adapter asks: re2
+#   needs binary haystack (see `re2_spans`), ruby valid UTF-8, rust gets
+#   UTF-8 as in the in-memory benchmarks
+def stream_chunk(engine, chunk)
+  case engine_adapter(engine)[:spans_haystack]
+  when :binary
+    chunk
+  when :valid_utf8
+    chunk.force_encoding(Encoding::UTF_8).scrub("")
+  else
+    chunk.force_encoding(Encoding::UTF_8)
+  end
+end
+
+# engines without spans recover positions from match strings, see `rust_search_spans`
+def stream_spans_method(engine)
+  adapter = engine_adapter(engine)
+  adapter[:spans] || adapter.fetch(:search_spans)
+end
+
+def char_boundary(haystack, position, step: 1)
+  return position if position <= 0
+
+  position += step while (haystack.getbyte(position) || 0) & 0b1100_0000 == 0b1000_0000
+  position
+end
+
+def utf8_char_bytes(haystack, position)
+  byte = haystack.getbyte(position) || 0
+
+  if byte >= 0b1111_0000 then 4
+  elsif byte >= 0b1110_0000 then 3
+  elsif byte >= 0b1100_0000 then 2
+  else 1
+  end
+end
+
+def stream_spans(engine, path, regexps, range:, chunk_bytes: STREAM_CHUNK_BYTES, overlap: STREAM_OVERLAP_BYTES, end_anchored: [])
+  spans_method = stream_spans_method(engine)
+
+  spans = Array.new(regexps.size) { [] }
+  resume = Array.new(regexps.size, 0)
+  offset = 0
+  buffer = engine_adapter(engine)[:spans_haystack] == :binary ? "".b : +""
+
+  File.open(path, "rb") do |file|
+    file.seek(range.begin)
+    remaining = range.size
+
+    loop do
+      chunk = read_chunk(file, remaining, chunk_bytes)
+      remaining -= chunk.bytesize
+      last = remaining.zero? || chunk.empty?
+
+      buffer << stream_chunk(engine, chunk)
+      limit = last ? buffer.bytesize + 1 : char_boundary(buffer, buffer.bytesize - overlap)
+
+      regexps.each_with_index do |regexp, idx|
+        spans_method.call(buffer, regexp, [resume[idx] - offset, 0].max).each_slice(2) do |match_start, match_end|
+          break if match_start >= limit
+          # `\z` or `$` matching at the end of the chunk, not of the haystack
+          break if !last && end_anchored[idx] && match_end >= buffer.bytesize - 1
+
+          spans[idx] << offset + match_start << offset + match_end
+
+          # step over empty match, as scan does
+          resume[idx] = offset + match_end
+          resume[idx] += utf8_char_bytes(buffer, match_end) if match_start == match_end
+        end
+
+        resume[idx] = [resume[idx], offset + limit].max unless last
+      end
+
+      break if last
+
+      # keep whole lines from the earliest position some regexp continues
+      # from, with the newline before them for `^`, `\b` and lookbehinds
+      keep_from = resume.min - offset
+      keep_from = keep_from <= 0 ? 0 : buffer.byterindex("\n", char_boundary(buffer, keep_from - 1, step: -1)) || 0
+
+      buffer = buffer.byteslice(keep_from..)
+      offset += keep_from
+    end
+  end
+
+  spans.flatten
+end
+
+def memory_spans(engine, path, regexps, range:)
+  haystack = File.open(path, "rb") { |file| file.seek(range.begin); file.read(range.size) || "".b }
+  haystack = stream_chunk(engine, haystack)
+  spans_method = stream_spans_method(engine)
+
+  regexps.flat_map { |regexp| spans_method.call(haystack, regexp) }
+end
+
+def run_stream_example(title, example, engines: ENGINES, chunk_bytes: STREAM_CHUNK_BYTES, overlap: STREAM_OVERLAP_BYTES)
+  puts "\n-- [#{title}] stream (chunk: #{chunk_bytes} bytes, overlap: #{overlap} bytes)"
+
+  path = example[:haystack].fetch(:path)
+  range = haystack_byte_range(example)
+  patterns = example_patterns(example).slice(*engines)
+  patterns.select! { |engine, _| engine_adapter(engine)[:spans] || engine_adapter(engine)[:search_spans] }
+
+  groups = patterns.to_h do |engine, engine_patterns|
+    engine_patterns = Array(engine_patterns)
+    anchors = engine_patterns.map { text_anchors(_1, engine_adapter(engine)[:syntax]) }
+    spans = engine_adapter(engine)[:spans]
+    kept = engine_patterns.each_index.reject { spans ? anchors[_1][0] : anchors[_1].any? }
+
+    if kept.size < engine_patterns.size
+      puts "#{ENGINE_LABELS.fetch(engine)}: #{engine_patterns.size - kept.size} of #{engine_patterns.size} patterns with text anchors, left out"
+    end
+
+    # search spans need whole matches, so captures are stripped
+    compile = spans ? ->(pattern) { pattern } : method(:strip_captures)
+    regexps = kept.map { cached_regexp(engine, compile.call(engine_patterns[_1]), example) }
+
+    [engine, { regexps: regexps, end_anchored: kept.map { anchors[_1][1] } }]
+  end
+
+  groups.reject! { |_, group| group[:regexps].empty? }
+
+  puts format("%-12s %14s %14s %14s %14s", "engine", "memory", "stream", "memory peak", "stream peak")
+
+  groups.each do |engine, group|
+    regexps, end_anchored = group.values_at(:regexps, :end_anchored)
+
+    scans = {
+      memory: -> { memory_spans(engine, path, regexps, range: range) },
+      stream: -> { stream_spans(engine, path, regexps, range: range, chunk_bytes: chunk_bytes, overlap: overlap, end_anchored: end_anchored) }
+    }
+
+    memory_result = scans[:memory].call
+    stream_result = scans[:stream].call
+    different = memory_result != stream_result
+
+    times = scans.transform_values { |scan| measure_median(&scan) }
+    peaks = scans.transform_values { |scan| peak_rss_growth(&scan) }
+
+    scans.each_key do |scan|
+      RESULTS << {
+        mode: "stream",
+        example: title,
+        engine: engine.to_s,
+        label: "#{ENGINE_LABELS.fetch(engine)} #{scan}",
+        haystack_bytes: range.size,
+        chunk_bytes: chunk_bytes,
+        overlap_bytes: overlap,
+        match_count: (scan == :memory ? memory_result : stream_result).size / 2,
+        different: different,
+        median_time: times[scan],
+        bytes_per_sec: range.size / times[scan],
+        peak_rss_growth: peaks[scan]
+      }
+    end
+
+    puts format(
+      "%-12s %9.1f MB/s %9.1f MB/s %11s MB %11s MB",
+      ENGINE_LABELS.fetch(engine),
+      range.size / times[:memory] / 1_000_000.0,
+      range.size / times[:stream] / 1_000_000.0,
+      peaks[:memory] ? format("%.1f", peaks[:memory] / 1_000_000.0) : "-",
+      peaks[:stream] ? format("%.1f", peaks[:stream] / 1_000_000.0) : "-"
+    )
+
+    next unless different
+
+    puts format(
+      "%-12s stream spans are different from in-memory spans: %d matches in memory, %d streamed",
+      ENGINE_LABELS.fetch(engine), memory_result.size / 2, stream_result.size / 2
+    )
+  end
+end
@@ -0,0 +1,139 @@
+# NOTE:
+# - haystack of every size is cut from (or built by repeating) the example
+#   haystack, so its line structure stays the same as in the example
+# - sizes below the example haystack are prefixes of it, which is what
+#   exposes super-linear behaviour on single-line haystacks (`cloudflare-redos/*`)
+# - every size is scanned at least SWEEP_MIN_RUNS times and for at least
+#   SWEEP_MIN_TIME seconds, the median run time is reported
+# - once a single run of an engine takes longer than SWEEP_TIME_LIMIT
+#   seconds, larger sizes are skipped for that engine; every size is first
+#   scanned once under the `--timeout` budget (see guard.rb), so a single run
+#   cannot hang the sweep
+SWEEP_MIN_BYTES = 1024
+SWEEP_MAX_BYTES = 256 * 1024 * 1024
+SWEEP_FACTOR = 4
+SWEEP_MIN_RUNS = 3
+SWEEP_MIN_TIME = 0.5
+SWEEP_TIME_LIMIT = 1.0
+
+def sweep_sizes(max_bytes)
+  sizes = [SWEEP_MIN_BYTES]
+  sizes << sizes.last * SWEEP_FACTOR while sizes.last * SWEEP_FACTOR <= max_bytes
+  sizes
+end
+
+def scaled_haystack(haystack, bytes)
+  scaled = haystack.bytesize < bytes ? haystack * bytes.fdiv(haystack.bytesize).ceil : haystack
+  return scaled if scaled.bytesize == bytes
+
+  # cut on a line boundary when there is one, otherwise on a character boundary
+  # (searched as bytes, `byterindex` raises on an offset inside a character)
+  cut = scaled.b.byterindex("\n", bytes - 1)&.succ || bytes
+  cut -= 1 while cut > 0 && (scaled.getbyte(cut) & 0b1100_0000) == 0b1000_0000
+
+  scaled.byteslice(0, cut)
+end
+
+def measure_median
+  times = []
+  started = Process.clock_gettime(Process::CLOCK_MONOTONIC)
+
+  loop do
+    start = Process.clock_gettime(Process::CLOCK_MONOTONIC)
+    yield
+    finish = Process.clock_gettime(Process::CLOCK_MONOTONIC)
+
+    times << finish - start
+    elapsed = finish - started
+
+    break if elapsed > SWEEP_TIME_LIMIT && times.size == 1
+    break if times.size >= SWEEP_MIN_RUNS && elapsed >= SWEEP_MIN_TIME
+  end
+
+  median(times)
+end
+
+# NOTE:
+# - `exponent` is the slope of least squares fit of log(time) against
+#   log(size): ~1 is linear, ~2 is quadratic
+# - `max_slope` is the steepest slope between two neighbouring sizes, so
+#   super-linear segments are not averaged out by the overall fit
+def fit_complexity(points)
+  xs = points.map { |bytes, _| Math.log(bytes) }
+  ys = points.map { |_, time| Math.log(time) }
+
+  x_mean = xs.sum / xs.size
+  y_mean = ys.sum / ys.size
+
+  covariance = xs.zip(ys).sum { |x, y| (x - x_mean) * (y - y_mean) }
+  variance = xs.sum { |x| (x - x_mean)**2 }
+
+  slopes = xs.zip(ys).each_cons(2).map { |(x1, y1), (x2, y2)| (y2 - y1) / (x2 - x1) }
+
+  {
+    exponent: covariance / variance,
+    max_slope: slopes.max
+  }
+end
+
+def run_sweep_example(title, example, engines: ENGINES, max_bytes: SWEEP_MAX_BYTES, timeout: SCAN_TIMEOUT)
+  puts "\n-- [#{title}] sweep"
+
+  haystack = prepare_haystack(example)
+  regexps = prepare_regexps(example)
+  sets = prepare_sets(example).slice(*engines) if example[:patterns_path]
+
+  scanners = scanners(regexps, sets).slice(*engines)
+  points = scanners.keys.to_h { [_1, []] }
+
+  puts format("%12s %s", "bytes", scanners.keys.map { ENGINE_LABELS.fetch(_1).rjust(16) }.join)
+
+  sweep_sizes(max_bytes).each do |bytes|
+    break if scanners.empty?
+
+    sized_haystack = scaled_haystack(haystack, bytes)
+    sized_haystack_valid_utf8 = valid_utf8_haystack(sized_haystack)
+
+    guarded = guard_engines(title, example, scanners, sized_haystack, sized_haystack_valid_utf8, timeout: timeout, mode: "sweep", haystack_bytes: sized_haystack.bytesize)
+    scanners.select! { |engine, _| guarded.include?(engine) }
+
+    times = scanners.to_h do |engine, scanner|
+      [engine, measure_median { scanner.call(sized_haystack, sized_haystack_valid_utf8) }]
+    end
+
+    times.each do |engine, time|
+      points[engine] << [sized_haystack.bytesize, time]
+      scanners.delete(engine) if time > SWEEP_TIME_LIMIT
+
+      RESULTS << {
+        mode: "sweep",
+        example: title,
+        engine: engine.to_s,
+        label: ENGINE_LABELS.fetch(engine),
+        haystack_bytes: sized_haystack.bytesize,
+        median_time: time,
+        bytes_per_sec: sized_haystack.bytesize / time
+      }
+    end
+
+    puts format("%12d %s", sized_haystack.bytesize, points.keys.map { times[_1] ? format("%14.6fs", times[_1]).rjust(16) : "-".rjust(16) }.join)
+  end
+
+  puts "Complexity:"
+
+  points.each do |engine, engine_points|
+    next if engine_points.size < 2
+
+    fit = fit_complexity(engine_points)
+
+    RESULTS << {
+      mode: "sweep_fit",
+      example: title,
+      engine: engine.to_s,
+      label: ENGINE_LABELS.fetch(engine),
+      **fit
+    }
+
+    puts format("%20s  time ~ n^%.2f (steepest n^%.2f)", ENGINE_LABELS.fetch(engine), fit[:exponent], fit[:max_slope])
+  end
+end
@@ -0,0 +1,30 @@
+require "minitest/autorun"
+require_relative "../prefilter"
+require_relative "../trie"
+require_relative "../analyze"
+
+class PatternFindingsTest < Minitest::Test
+  def finding_kinds(pattern)
+    pattern_findings(pattern).map { _1[:kind] }
+  end
+
+  def test_flags_branches_matching_at_same_position
+    assert_equal ["overlapping alternation"], finding_kinds('(?:\d|\w)*')
+    assert_equal ["overlapping alternation"], finding_kinds("(a|aa)*")
+    assert_equal ["overlapping alternation"], finding_kinds("(ab|a)+")
+    assert_equal ["overlapping alternation"], finding_kinds("([ab]c|ac)*")
+    assert_equal ["overlapping alternation"], finding_kinds("(?i)(ab|AB)*")
+  end
+
+  def test_skips_literal_alternations_without_common_prefix
+    assert_empty finding_kinds("(ACDT|ACST|ACT|ACWDT)*")
+    assert_empty finding_kinds('(?:\s|-|~)*')
+    assert_empty finding_kinds("([ab]c|ad)*")
+    assert_empty finding_kinds("(ACDT|ACDT)")
+  end
+
+  def test_flags_nested_quantifiers_and_neighbours
+    assert_equal ["nested quantifier"], finding_kinds("(a+|b)*")
+    assert_equal ["overlapping neighbours"], finding_kinds(".*.*=.*").uniq
+  end
+end
@@ -0,0 +1,52 @@
+require "minitest/autorun"
+require_relative "../helpers"
+require_relative "../fold"
+
+class FoldScanTest < Minitest::Test
+  def assert_same_matches(pattern, haystack)
+    literals = casei_literals(pattern)
+    fast = ruby_fold_scan(haystack, fold_haystack(haystack), fold_search(literals))
+
+    assert_equal haystack.scan(Regexp.new(pattern)), fast, "#{pattern} on #{haystack.inspect}"
+  end
+
+  def test_takes_literal_alternations_only
+    assert_equal ["sherlock", "holmes"], casei_literals("(?i)Sherlock|HOLMES")
+    assert_equal ["a.b"], casei_literals('(?i)a\.b')
+    assert_nil casei_literals("Sherlock")
+    assert_nil casei_literals("(?i)Sher.ock")
+  end
+
+  def test_matches_ascii_literals
+    assert_same_matches("(?i)sherlock|holmes", "SHERLOCK Holmes sherlockholmes")
+    assert_same_matches('(?i)a\.b', "A.B a.b axb")
+  end
+
+  def test_matches_sharp_s
+    assert_same_matches("(?i)strasse", "Straße STRASSE strasse STRAẞE")
+    assert_same_matches("(?i)straße", "Straße STRASSE strasse STRAẞE")
+    assert_same_matches("(?i)ss", "ß ẞ s S ss")
+  end
+
+  def test_skips_matches_inside_folded_char
+    assert_same_matches("(?i)s", "ß ẞ s S")
+  end
+
+  def test_maps_offsets_after_chars_folding_to_other_byte_length
+    assert_same_matches("(?i)kelvin", "K Kelvin KELVIN")
+    assert_same_matches("(?i)k", "K k K")
+    assert_same_matches("(?i)istanbul", "İstanbul ISTANBUL istanbul")
+    assert_same_matches("(?i)i", "İ I i")
+  end
+
+  def test_fold_offset
+    changes = fold_haystack("aẞb")[:changes]
+
+    assert_equal [[1, 3, 1, 4]], changes
+    assert_equal 0, fold_offset(changes, 0)
+    assert_equal 1, fold_offset(changes, 1)
+    assert_nil fold_offset(changes, 2)
+    assert_equal 4, fold_offset(changes, 3)
+    assert_equal 5, fold_offset(changes, 4)
+  end
+end
@@ -0,0 +1,46 @@
+require "minitest/autorun"
+require_relative "../helpers"
+
+class StripCapturesTest < Minitest::Test
+  def assert_same_matches(pattern, haystack)
+    stripped = strip_captures(pattern)
+    whole_matches = ->(regexp) { haystack.to_enum(:scan, regexp).map { Regexp.last_match[0] } }
+
+    assert_equal whole_matches.call(Regexp.new(pattern)), whole_matches.call(Regexp.new(stripped)), "#{pattern} -> #{stripped}"
+  end
+
+  def test_strips_unnamed_groups
+    assert_equal "(?:a|b)+c", strip_captures("(a|b)+c")
+    assert_equal "(?:(?:a)(?:b))", strip_captures("((a)(b))")
+    assert_same_matches("(a|b)+c", "abc bbc c")
+    refute capture_groups?(strip_captures("((a)(b))"))
+  end
+
+  def test_keeps_escaped_parens_and_classes
+    assert_equal '\((?:x)\)', strip_captures('\((x)\)')
+    assert_equal "[(]a(?:b)", strip_captures("[(]a(b)")
+    assert_equal '[\]()]+(?:x)', strip_captures('[\]()]+(x)')
+    assert_same_matches('\((x)\)', "(x) x")
+    assert_same_matches('[\]()]+(x)', "]()x (x")
+  end
+
+  def test_keeps_literal_bracket_first_in_class
+    assert_equal "[]()]+(?:x)", strip_captures("[]()]+(x)")
+    assert_equal "[^]()]+(?:x)", strip_captures("[^]()]+(x)")
+  end
+
+  def test_keeps_lookarounds_flags_and_named_groups
+    assert_equal "a(?=(?:b))", strip_captures("a(?=(b))")
+    assert_equal "(?i)(?:A)", strip_captures("(?i)(A)")
+    assert_equal "(?<n>a)(?:b)", strip_captures("(?<n>a)(b)")
+    assert_same_matches("a(?=(b))", "ab ac")
+    assert_same_matches("(?i)(A)", "a A")
+  end
+
+  def test_keeps_patterns_with_backreferences
+    assert_equal '(a)\1', strip_captures('(a)\1')
+    assert_equal '(?<n>a)(b)\k<n>', strip_captures('(?<n>a)(b)\k<n>')
+    assert_equal '(?:a)\\\\1', strip_captures('(a)\\\\1')
+    assert_same_matches('(a)\1', "aa ab")
+  end
+end
@@ -0,0 +1,25 @@
+require "minitest/autorun"
+require_relative "../sweep"
+
+class ScaledHaystackTest < Minitest::Test
+  def test_cuts_multibyte_haystack_on_line_boundary
+    haystack = "Шерлок\n" * 100
+    scaled = scaled_haystack(haystack, 1024)
+
+    assert scaled.valid_encoding?
+    assert scaled.end_with?("\n")
+    assert_operator scaled.bytesize, :<=, 1024
+  end
+
+  def test_cuts_multibyte_haystack_without_lines_on_character_boundary
+    haystack = "a福尔摩斯" * 100
+    scaled = scaled_haystack(haystack, 1024)
+
+    assert scaled.valid_encoding?
+    assert_equal 1024, scaled.bytesize
+  end
+
+  def test_repeats_short_haystack
+    assert_equal "ab\n" * 341, scaled_haystack("ab\n", 1024)
+  end
+end
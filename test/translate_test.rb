@@ -0,0 +1,63 @@
+require "minitest/autorun"
+require_relative "../helpers"
+require_relative "../prefilter"
+require_relative "../translate"
+
+# expected matches are the ones rust/regex finds with the canonical pattern
+class TranslatePatternTest < Minitest::Test
+  def assert_ruby_matches(expected, pattern, haystack, unicode: true)
+    translated = translate_pattern(pattern, :ruby, unicode: unicode)
+
+    assert_equal expected, haystack.scan(Regexp.new(translated)), "#{pattern} -> #{translated}"
+  end
+
+  def test_bare_flags_apply_to_later_branches
+    assert_ruby_matches(["aB", "C", "c"], "a(?i)b|c", "aB C c")
+    assert_equal "(a(?i:b)|(?i:c))", translate_pattern("a(?i)b|c", :re2)
+  end
+
+  def test_anchors_match_text_outside_multiline
+    assert_ruby_matches([], "^abc$", "abc\nabc")
+    assert_ruby_matches(["abc"], "^abc$", "abc")
+    assert_ruby_matches(["abc", "abc"], "(?m)^abc$", "abc\nabc")
+  end
+
+  def test_dot_all_flag
+    assert_ruby_matches(["a\nb"], "(?s)a.b", "a\nb")
+    assert_ruby_matches([], "a.b", "a\nb")
+  end
+
+  def test_unicode_classes
+    assert_ruby_matches(["héllo", "wörld"], '\w+', "héllo wörld")
+    assert_ruby_matches(["h", "llo", "w", "rld"], '\w+', "héllo wörld", unicode: false)
+    assert_ruby_matches(["٣"], '\d', "x٣")
+    assert_ruby_matches([" ", "é"], '\W', " é", unicode: false)
+    assert_equal "([\\p{L}\\p{M}\\p{Nd}\\p{Pc}-]+)", translate_pattern('[\w-]+', :re2)
+  end
+
+  def test_word_boundary
+    assert_ruby_matches(["x"], '\bx', "éx", unicode: false)
+    assert_ruby_matches([], '\bx', "éx")
+    assert_raises(UntranslatablePattern) { translate_pattern('\bx', :re2) }
+    assert_equal '(\bx)', translate_pattern('\bx', :re2, unicode: false)
+  end
+
+  def test_rust_only_escapes_and_groups
+    assert_ruby_matches(["☺"], '\x{263A}', "a☺")
+    assert_ruby_matches(["ab"], '\pL+', "ab1")
+    assert_equal "x", "x".match(Regexp.new(translate_pattern("(?P<n>x)", :ruby)))[:n]
+  end
+
+  def test_rejects_constructs_without_equivalent
+    assert_raises(UntranslatablePattern) { translate_pattern("[a-z--b]", :ruby) }
+    assert_raises(UntranslatablePattern) { translate_pattern("[a-z&&b]", :re2) }
+    assert_raises(UntranslatablePattern) { translate_pattern("a(?=b)", :re2) }
+    assert_raises(UntranslatablePattern) { translate_pattern("a++", :re2) }
+  end
+
+  def test_wraps_re2_patterns_without_captures
+    assert_equal "(abc)", translate_pattern("abc", :re2)
+    assert_equal "a(b)c", translate_pattern("a(b)c", :re2)
+    assert_equal "abc", translate_pattern("abc", :rust)
+  end
+end
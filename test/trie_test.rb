@@ -0,0 +1,40 @@
+require "minitest/autorun"
+require_relative "../prefilter"
+require_relative "../trie"
+
+class TriePatternTest < Minitest::Test
+  def assert_same_matches(pattern, haystack)
+    rewritten = trie_pattern(pattern)
+
+    assert_equal haystack.scan(Regexp.new(pattern)), haystack.scan(Regexp.new(rewritten)),
+      "#{pattern} -> #{rewritten} on #{haystack.inspect}"
+  end
+
+  def test_merges_literal_prefixes
+    assert_equal "Sh(?:erlock(?: Holmes)?|irley)", trie_pattern("Sherlock Holmes|Sherlock|Shirley")
+    assert_same_matches("Sherlock Holmes|Sherlock|Shirley", "Sherlock Holmes, Shirley and Sherlock")
+  end
+
+  def test_keeps_leftmost_first_priority
+    assert_same_matches("ab|a|abc", "abc ab a")
+    assert_same_matches("a|b|ab", "ab ba")
+  end
+
+  def test_does_not_merge_on_quantified_token
+    assert_same_matches("a*ab|a*", "aab aa b")
+    assert_same_matches("x+y|x+", "xxy xx")
+    assert_same_matches("a?b|a?", "ab a b")
+  end
+
+  def test_keeps_case_insensitive_groups
+    assert_same_matches("(?i:Sherlock|SHIRLEY)|Holmes", "sherlock shirley holmes Holmes")
+  end
+
+  def test_keeps_capture_groups
+    pattern = "(ab|ac)d|(ab)"
+    rewritten = trie_pattern(pattern)
+
+    assert_equal "abd".match(pattern).captures, "abd".match(rewritten).captures
+    assert_same_matches(pattern, "abd acd ab")
+  end
+end
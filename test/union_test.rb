@@ -0,0 +1,21 @@
+require "minitest/autorun"
+require_relative "../helpers"
+
+class UnionSpansTest < Minitest::Test
+  def test_reports_rule_of_each_match
+    patterns = ["foo", "(b)ar"]
+    regexp = Regexp.new(union_pattern(patterns))
+
+    assert_equal [0, 0, 3, 1, 4, 7], ruby_union_spans("foo bar", regexp, patterns.size)
+  end
+
+  def test_misses_overlapping_matches_of_other_rules
+    patterns = ["foobar", "bar"]
+    haystack = "foobar"
+    rule_spans = ruby_rule_spans(haystack, patterns.map { Regexp.new(_1) })
+    union_spans = ruby_union_spans(haystack, Regexp.new(union_pattern(patterns)), patterns.size)
+
+    assert_equal [0, 0, 6, 1, 3, 6], rule_spans
+    assert_equal [1, 0], union_differences(rule_spans, union_spans)
+  end
+end
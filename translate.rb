@@ -0,0 +1,247 @@
+# NOTE:
+# - canonical patterns are in rust/regex syntax, `translate_pattern` emits the
+#   form another engine matches the same way, or raises UntranslatablePattern
+#   for constructs the engine has no equivalent of
+# - flags: a bare `(?i)` applies to the rest of its group in rust and re2,
+#   later branches included, ruby reads `a(?i)b|c` as `a(?i:b|c)`; bare
+#   flags are turned into scoped groups `(?i:...)` closed at the end of the
+#   branch and reopened in later branches; leading flags of the whole
+#   pattern mean the same in every engine and are kept (`casei_literals`
+#   relies on them); ruby `m` is rust `s`
+# - anchors: ruby `^`/`$` always match at lines, rust ones only with `(?m)`,
+#   so ruby gets `\A`/`\z` outside of `(?m)`
+# - Unicode: rust `\w`, `\d`, `\s` are Unicode-aware unless `unicode: false`,
+#   ruby and re2 ones are ASCII, so they become `\p{Word}`, `\p{Nd}`,
+#   `\p{Space}` in ruby and Unicode class unions in re2; ruby `\b` is
+#   Unicode-aware and becomes `(?a:\b)` with `unicode: false`, re2 `\b` is
+#   ASCII only and is rejected with Unicode
+# - re2 scan returns captures only (see `capturize_re2_pattern`), so patterns
+#   without capture groups are wrapped in one
+class UntranslatablePattern < ArgumentError; end
+
+TRANSLATE_SYNTAXES = %i[ruby re2 rust].freeze
+TRANSLATE_FLAGS = {
+  ruby: { "i" => "i", "s" => "m", "m" => "" },
+  re2: { "i" => "i", "s" => "s", "m" => "m", "U" => "U" }
+}.freeze
+TRANSLATE_UNICODE_CLASSES = {
+  ruby: { "w" => "\\p{Word}", "d" => "\\p{Nd}", "s" => "\\p{Space}" },
+  re2: { "w" => "\\p{L}\\p{M}\\p{Nd}\\p{Pc}", "d" => "\\p{Nd}", "s" => "\\t\\n\\x0B\\f\\r\\x{85}\\p{Z}" }
+}.freeze
+TRANSLATE_RE2_UNSUPPORTED = {
+  /\A\(\?<?[=!]/ => "lookarounds",
+  /\A\(\?>/ => "atomic groups",
+  /\A\\[1-9k]/ => "backreferences",
+  /\A\\[GKZ]/ => "this anchor",
+  /\A(?:[*+?]|\{\d+(?:,\d*)?\})\+/ => "possessive quantifiers"
+}.freeze
+
+def reject_unsupported!(text, engine)
+  return unless engine == :re2
+
+  TRANSLATE_RE2_UNSUPPORTED.each do |construct, name|
+    raise UntranslatablePattern, "re2 has no #{name}: `#{text}`" if text.match?(construct)
+  end
+end
+
+def translate_flags(flags, engine)
+  translated_on, translated_off = flags.split("-", 2).map do |chars|
+    chars.to_s.chars.map do |flag|
+      TRANSLATE_FLAGS.fetch(engine).fetch(flag) { raise UntranslatablePattern, "#{engine} has no `#{flag}` flag" }
+    end.join
+  end
+
+  translated_off.to_s.empty? ? translated_on.to_s : "#{translated_on}-#{translated_off}"
+end
+
+def active_flags(flags, group_flags)
+  on, off = group_flags.split("-", 2).map { _1.to_s.chars }
+  (flags | on.to_a) - off.to_a
+end
+
+# returns `[translated, pos]`
+def translate_escape(pattern, pos, engine, unicode, in_class)
+  escape = pattern[pos..][/\A\\(?:x\{\h+\}|[pP](?:\{[^}]*\}|\w)|.)/m]
+  escaped = escape[1]
+  reject_unsupported!(escape, engine) unless in_class
+
+  translated =
+    if engine == :ruby && escaped == "x" && escape.size > 2
+      "\\u{#{escape[3...-1]}}"
+    elsif engine == :ruby && "pP".include?(escaped) && escape.size == 3
+      "\\#{escaped}{#{escape[2]}}"
+    elsif "bB".include?(escaped) && !in_class
+      raise UntranslatablePattern, "re2 has no Unicode word boundary" if engine == :re2 && unicode
+
+      engine == :ruby && !unicode ? "(?a:#{escape})" : escape
+    elsif unicode && "wdsWDS".include?(escaped)
+      translate_class_escape(escaped, engine, in_class)
+    else
+      escape
+    end
+
+  [translated, pos + escape.size]
+end
+
+def translate_class_escape(escaped, engine, in_class)
+  positive = TRANSLATE_UNICODE_CLASSES.fetch(engine).fetch(escaped.downcase)
+  negated = escaped == escaped.upcase
+
+  # single properties negate with `\P`, re2 unions only as a class
+  return negated ? positive.sub("\\p", "\\P") : positive unless positive.count("\\") > 1
+  return in_class ? positive : "[#{positive}]" unless negated
+  return "[^#{positive}]" unless in_class
+
+  raise UntranslatablePattern, "re2 cannot negate `\\#{escaped.downcase}` inside a class"
+end
+
+def translate_class(pattern, pos, engine, unicode)
+  class_end = skip_class(pattern, pos)
+  text = pattern[pos...class_end]
+
+  # ruby shares `&&` with rust, `--` and `~~` are rust only
+  if text.match?(/--|~~/) || (engine == :re2 && text.include?("&&"))
+    raise UntranslatablePattern, "#{engine} has no class set operations: `#{text}`"
+  end
+
+  # `[\s\S]` and alike match any char in every engine
+  return [text, class_end] if %w[w d s].any? { text.include?("\\#{_1}") && text.include?("\\#{_1.upcase}") }
+
+  translated = +""
+  pos += 1
+
+  while pos < class_end - 1
+    if pattern[pos] == "\\"
+      escape, pos = translate_escape(pattern, pos, engine, unicode, true)
+      translated << escape
+    else
+      translated << pattern[pos]
+      pos += 1
+    end
+  end
+
+  ["[#{translated}]", class_end]
+end
+
+# returns `[translated, pos]`
+def translate_alternation(pattern, pos, engine, unicode, flags)
+  branches = []
+  carried = []
+
+  loop do
+    branch, pos, bare_flags = translate_branch(pattern, pos, engine, unicode, flags, carried)
+
+    branches << branch
+    carried += bare_flags
+    flags = bare_flags.reduce(flags) { active_flags(_1, _2) }
+    break unless pattern[pos] == "|"
+
+    pos += 1
+  end
+
+  [branches.join("|"), pos]
+end
+
+# returns `[translated, pos, bare flags]`, bare flags of earlier branches
+# (`carried`) reopen their scoped groups at the start of the branch
+def translate_branch(pattern, pos, engine, unicode, flags, carried)
+  text = +""
+  carried.each { text << "(?#{translate_flags(_1, engine)}:" }
+  scopes = carried.size
+  bare_flags = []
+
+  until pattern[pos].nil? || pattern[pos] == "|" || pattern[pos] == ")"
+    char = pattern[pos]
+
+    if char == "\\"
+      escape, pos = translate_escape(pattern, pos, engine, unicode, false)
+      text << escape
+    elsif char == "["
+      class_text, pos = translate_class(pattern, pos, engine, unicode)
+      text << class_text
+    elsif char == "("
+      header = pattern[pos..][/\A\((?:\?(?:[a-zA-Z]*(?:-[a-zA-Z]*)?[:)]|P?<[a-zA-Z_]\w*>|[=!>]|<[=!]))?/]
+      raise UntranslatablePattern, "unknown group at #{pos}" unless header
+
+      reject_unsupported!(header, engine)
+      pos += header.size
+      group_flags = header[/\A\(\?([a-zA-Z]*(?:-[a-zA-Z]*)?)[:)]\z/, 1]
+
+      if group_flags && header.end_with?(")")
+        text << "(?#{translate_flags(group_flags, engine)}:"
+        scopes += 1
+        bare_flags << group_flags
+        flags = active_flags(flags, group_flags)
+        next
+      end
+
+      inner, pos = translate_alternation(pattern, pos, engine, unicode, group_flags ? active_flags(flags, group_flags) : flags)
+      raise UntranslatablePattern, "unterminated group in #{pattern}" unless pattern[pos] == ")"
+
+      pos += 1
+
+      if group_flags
+        header = "(?#{translate_flags(group_flags, engine)}:"
+      elsif engine == :ruby
+        header = header.sub("(?P<", "(?<")
+      end
+
+      text << header << inner << ")"
+    elsif engine == :ruby && "^$".include?(char) && !flags.include?("m")
+      text << (char == "^" ? "\\A" : "\\z")
+      pos += 1
+    else
+      reject_unsupported!(pattern[pos..], engine)
+      text << char
+      pos += 1
+    end
+  end
+
+  [text + ")" * scopes, pos, bare_flags]
+end
+
+def translate_pattern(pattern, engine, unicode: true)
+  raise ArgumentError, "unknown pattern syntax: #{engine}" unless TRANSLATE_SYNTAXES.include?(engine)
+  return pattern if engine == :rust
+
+  leading_flags = pattern[/\A\(\?([a-zA-Z]*(?:-[a-zA-Z]*)?)\)/, 1]
+  start = leading_flags ? leading_flags.size + 3 : 0
+  flags = leading_flags ? active_flags([], leading_flags) : []
+
+  translated, pos = translate_alternation(pattern, start, engine, unicode, flags)
+  raise UntranslatablePattern, "unbalanced `)` in #{pattern}" unless pos == pattern.size
+
+  if leading_flags
+    leading = translate_flags(leading_flags, engine)
+    translated = "(?#{leading})#{translated}" unless leading.empty?
+  end
+
+  engine == :re2 && !capture_groups?(translated) ? "(#{translated})" : translated
+end
+
+def translation_unicode(example)
+  example[:unicode] != false
+end
+
+# patterns of engines a canonical pattern translates to, others are skipped
+def translated_patterns(pattern, example)
+  regexp_engines.filter_map do |engine|
+    [engine, translate_pattern(pattern, engine_adapter(engine)[:syntax], unicode: translation_unicode(example))]
+  rescue UntranslatablePattern
+    nil
+  end.to_h
+end
+
+# canonical patterns of hand-written examples, rules of rule files are
+# translated one by one
+def canonical_patterns(example)
+  if example[:pattern]
+    example[:pattern]
+  elsif pattern_path = example[:pattern_path]
+    File.read(pattern_path)
+  elsif patterns_path = example[:patterns_path]
+    File.read(patterns_path).split("\n")
+  else
+    example[:patterns][:rust]
+  end
+end
@@ -0,0 +1,119 @@
+# NOTE:
+# - rebuilds the hand-curated rule files (`regexps_selected*.txt`) from a
+#   full rule file: every rule is compiled in every engine, with the
+#   example's unicode setting and with `unicode: false`
+# - compatible rules are written to `<rules>_compatible.txt`, the ones that
+#   compile everywhere in both modes
+# - cost of a rule is its slowest scan on the example haystack in ms per MB,
+#   over the selected engines; `re2 set` and `rust/regex set` are scanned as
+#   single-rule sets, which is what exposes wide scopes
+# - the fast subset takes the cheapest compatible rules while their summed
+#   cost stays within `--budget` and is written to `<rules>_fast.txt`
+#   (`<rules>_fast_no_unicode.txt` for `unicode: false` examples)
+# - rules keep the order of the rule file in both outputs
+# - outputs go to `--triage-dir`, TRIAGE_DIR by default, so the tracked
+#   rule files in `data/` are only replaced on purpose
+TRIAGE_BUDGET_MS_PER_MB = 100.0
+TRIAGE_DIR = File.join(Dir.tmpdir, "regexp-bench-triage")
+
+def triage_incompatibilities(patterns, example)
+  modes = {
+    nil => example.except(:unicode),
+    "no-unicode" => example.merge(unicode: false)
+  }
+
+  regexp_engines.flat_map do |engine|
+    modes.filter_map do |mode, mode_example|
+      # ruby has no unicode switch
+      next if mode && !engine_supports?(engine, :unicode_option)
+
+      [ENGINE_LABELS.fetch(engine), mode].compact.join(" ") unless compiles?(engine, patterns.fetch(engine), mode_example)
+    end
+  end
+end
+
+def triage_costs(patterns, example, engines, haystack, haystack_valid_utf8)
+  megabytes = haystack.bytesize / 1_000_000.0
+
+  costs = regexp_engines.intersection(engines).to_h do |engine|
+    scanner = scanners({ engine => compile_regexp(engine, patterns.fetch(engine), example) }).fetch(engine)
+    [engine, measure_median { scanner.call(haystack, haystack_valid_utf8) }]
+  end
+
+  set_engines.intersection(engines).each do |engine|
+    set = compile_set(engine, [patterns.fetch(engine_adapter(engine)[:set_of])], example)
+    costs[engine] = measure_median { set.match(haystack) }
+  end
+
+  costs.transform_values { _1 * 1000 / megabytes }
+end
+
+def fast_rules(costs, budget)
+  total = 0.0
+
+  costs.sort_by { |_, cost| cost }.take_while { |_, cost| (total += cost) <= budget }.map(&:first)
+end
+
+def triage_path(rules_path, output_dir, suffix)
+  File.join(output_dir, "#{File.basename(rules_path, ".*")}_#{suffix}.txt")
+end
+
+def run_triage_example(title, example, engines: ENGINES, rules: nil, budget: TRIAGE_BUDGET_MS_PER_MB, triage_dir: TRIAGE_DIR)
+  rules_path = rules || example[:patterns_path]
+
+  unless rules_path
+    puts "\n-- [#{title}] triage: skipped, example has no rule file"
+    return
+  end
+
+  puts "\n-- [#{title}] triage (#{rules_path}, budget: #{budget} ms/MB)"
+
+  haystack = prepare_haystack(example)
+  haystack_valid_utf8 = valid_utf8_haystack(haystack)
+  rules = File.read(rules_path).split("\n")
+
+  puts format("%4s %12s  %-32s %s", "rule", "cost", "incompatible", "pattern")
+
+  costs = {}
+
+  rules.each_with_index do |rule, idx|
+    patterns = rule_patterns([rule]).transform_values(&:first)
+    incompatibilities = triage_incompatibilities(patterns, example)
+    engine_costs = triage_costs(patterns, example, engines, haystack, haystack_valid_utf8) if incompatibilities.empty?
+    costs[rule] = engine_costs.values.max if engine_costs
+
+    RESULTS << {
+      mode: "triage",
+      example: title,
+      rules_path: rules_path,
+      rule_index: idx,
+      rule: rule,
+      haystack_bytes: haystack.bytesize,
+      incompatible: incompatibilities.join(", "),
+      cost_ms_per_mb: costs[rule],
+      **(engine_costs || {}).transform_keys { :"#{_1}_ms_per_mb" }
+    }
+
+    puts format(
+      "%4d %12s  %-32s %s",
+      idx + 1,
+      costs[rule] ? format("%.3f ms/MB", costs[rule]) : "-",
+      incompatibilities.join(", "),
+      rule.length > 60 ? "#{rule[0, 57]}..." : rule
+    )
+  end
+
+  fast = fast_rules(costs, budget)
+
+  outputs = {
+    triage_path(rules_path, triage_dir, "compatible") => rules.select { costs.key?(_1) },
+    triage_path(rules_path, triage_dir, example[:unicode] == false ? "fast_no_unicode" : "fast") => rules.select { fast.include?(_1) }
+  }
+
+  FileUtils.mkdir_p(triage_dir)
+
+  outputs.each do |path, selected|
+    File.write(path, selected.map { "#{_1}\n" }.join)
+    puts "Wrote #{selected.size} of #{rules.size} rules to #{path}"
+  end
+end
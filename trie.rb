@@ -0,0 +1,243 @@
+# NOTE:
+# - runs of alternation branches that are sequences of near-literal tokens
+#   (chars, escapes, classes, optionally quantified) are rewritten into a trie:
+#   `Sherlock Holmes|Sherlock|Shirley` -> `Sh(?:erlock(?: Holmes)?|irley)`;
+#   other branches are kept, with their groups rewritten recursively
+# - leftmost-first priority is kept: a branch is merged into an earlier one
+#   with the same first token only when every branch between them starts
+#   with a token matching a disjoint set of chars, and never across a
+#   shorter branch ending at that node
+# - branches are merged only on single-char tokens with known chars: a
+#   quantified token backtracks into what follows it, so `a*ab|a*` must not
+#   become `a*(?:ab)?`, which matches "aa" of "aab"
+# - children of a node are sorted when their first tokens are disjoint
+# - only non-capturing groups are added, so captures keep their numbers
+TRIE_QUANTIFIER = /\A(?:[?*+]|\{\d+(?:,\d*)?\})[?+]?/
+TRIE_DIGITS = ("0".."9").to_a.freeze
+
+TrieToken = Struct.new(:text, :chars)
+
+# chars matched by a literal char, nil when unknown
+def trie_char_set(char, ignore_case)
+  ignore_case ? [char.downcase, char.upcase].uniq : [char]
+end
+
+def trie_class_chars(body, ignore_case)
+  return if body.start_with?("^")
+
+  chars = []
+  members = body.scan(/\\.|.-.|./m)
+
+  members.each do |member|
+    if member == "\\d"
+      chars.concat(TRIE_DIGITS)
+    elsif member.start_with?("\\")
+      return unless member[1].match?(/[^a-zA-Z0-9]/)
+
+      chars << member[1]
+    elsif member.size == 3
+      chars.concat((member[0]..member[2]).to_a)
+    else
+      chars << member
+    end
+  end
+
+  ignore_case ? chars.flat_map { trie_char_set(_1, true) }.uniq : chars.uniq
+end
+
+# returns `[token, pos]` for a single unquantified char, escape or class at
+# `pos`, `[nil, pos]` for a group
+def trie_atom(pattern, pos, ignore_case)
+  char = pattern[pos]
+
+  text, chars =
+    case char
+    when "(", ")", "|"
+      return [nil, pos]
+    when "\\"
+      escaped = pattern[pos + 1]
+      if escaped == "d"
+        ["\\d", TRIE_DIGITS]
+      elsif escaped.match?(/[^a-zA-Z0-9]/)
+        [pattern[pos, 2], trie_char_set(escaped, ignore_case)]
+      else
+        [pattern[pos..][/\A\\(?:[pPx]\{[^}]*\}|x\h{2}|[pP]\w|.)/m], nil]
+      end
+    when "["
+      class_end = skip_class(pattern, pos)
+      [pattern[pos...class_end], trie_class_chars(pattern[pos + 1...class_end - 1], ignore_case)]
+    when ".", "^", "$"
+      [char, nil]
+    else
+      [char, trie_char_set(char, ignore_case)]
+    end
+
+  [TrieToken.new(text, chars), pos + text.size]
+end
+
+# returns `[token, pos]` for a near-literal token at `pos`, `[nil, pos]` for a group
+def trie_token(pattern, pos, ignore_case)
+  token, pos = trie_atom(pattern, pos, ignore_case)
+  return [token, pos] unless token
+
+  quantifier = pattern[pos..][TRIE_QUANTIFIER]
+  return [token, pos] unless quantifier
+
+  # a quantified token may match nothing or repeat, so its chars are unknown
+  [TrieToken.new(token.text + quantifier, nil), pos + quantifier.size]
+end
+
+def tokens_disjoint?(token, other)
+  token.chars && other.chars && (token.chars & other.chars).empty?
+end
+
+def trie_insert(node, tokens)
+  if tokens.empty?
+    node[:items] << :end unless node[:items].include?(:end)
+    return
+  end
+
+  token, *rest = tokens
+  child_idx = token.chars && node[:items].rindex { _1 != :end && _1[:token].text == token.text }
+
+  mergeable = child_idx && node[:items][child_idx + 1..].all? do |item|
+    item != :end && tokens_disjoint?(token, item[:token])
+  end
+
+  unless mergeable
+    node[:items] << { token: token, node: { items: [] } }
+    child_idx = node[:items].size - 1
+  end
+
+  trie_insert(node[:items][child_idx][:node], rest)
+end
+
+def trie_sorted_items(items)
+  # runs between ends can be sorted when their first tokens are disjoint
+  items.slice_when { |a, b| a == :end || b == :end }.flat_map do |run|
+    next run if run == [:end]
+
+    disjoint = run.combination(2).all? { |a, b| tokens_disjoint?(a[:token], b[:token]) }
+    disjoint ? run.sort_by { _1[:token].text } : run
+  end
+end
+
+def trie_emit(node)
+  items = trie_sorted_items(node[:items])
+  branches = items.map { _1 == :end ? "" : _1[:token].text + trie_emit(_1[:node]) }
+
+  return branches.first if branches.size == 1
+  return "(?:#{branches.first})?" if branches.size == 2 && branches.last.empty?
+
+  "(?:#{branches.join("|")})"
+end
+
+# returns `[rewritten alternation, pos]` of alternation starting at `pos`
+def trie_alternation(pattern, pos, ignore_case)
+  prefix = +""
+
+  # leading flags apply to every branch, e.g. `(?i)a|b`
+  if (flags = pattern[pos..][/\A\(\?[a-zA-Z]*(?:-[a-zA-Z]*)?\)/])
+    prefix << flags
+    ignore_case ||= flags[/\A\(\?[a-zA-Z]*/].include?("i")
+    pos += flags.size
+  end
+
+  branches = []
+
+  loop do
+    branch, pos, ignore_case = trie_branch(pattern, pos, ignore_case)
+    branches << branch
+    break unless pattern[pos] == "|"
+
+    pos += 1
+  end
+
+  # consecutive near-literal branches are merged, so priority of other branches is kept
+  texts = branches.chunk_while { |a, b| a[:tokens] && b[:tokens] }.map do |run|
+    next run.first[:text] if run.size == 1
+
+    root = { items: [] }
+    run.each { trie_insert(root, _1[:tokens]) }
+    node = trie_emit(root)
+
+    # unwrap the group around the root, its branches are branches of the alternation
+    node.start_with?("(?:") && trie_group_end(node, 0) == node.size ? node[3...-1] : node
+  end
+
+  [prefix + texts.join("|"), pos]
+end
+
+def trie_group_end(text, pos)
+  depth = 0
+  escaped = false
+  in_class = false
+
+  text.each_char.with_index do |char, idx|
+    next if idx < pos
+
+    if escaped
+      escaped = false
+    elsif char == "\\"
+      escaped = true
+    elsif in_class
+      in_class = false if char == "]"
+    elsif char == "["
+      in_class = true
+    elsif char == "("
+      depth += 1
+    elsif char == ")"
+      depth -= 1
+      return idx + 1 if depth.zero?
+    end
+  end
+
+  nil
+end
+
+# returns `[{ text:, tokens: }, pos, ignore_case]`, tokens are nil when the
+# branch has groups; flags set in the branch apply to later branches too
+def trie_branch(pattern, pos, ignore_case)
+  text = +""
+  tokens = []
+
+  until pattern[pos].nil? || pattern[pos] == "|" || pattern[pos] == ")"
+    token, pos = trie_token(pattern, pos, ignore_case)
+
+    if token
+      text << token.text
+      tokens&.push(token)
+      next
+    end
+
+    header = pattern[pos..][/\A\((?:\?(?:[a-zA-Z]*(?:-[a-zA-Z]*)?[:)]|P?<[a-zA-Z_]\w*>|[=!>]|<[=!]))?/]
+    pos += header.size
+    tokens = nil
+
+    if header.end_with?(")")
+      # flags in the middle of a branch change every later token
+      text << header
+      ignore_case ||= header.include?("i")
+      next
+    end
+
+    group_ignore_case = ignore_case || header.match?(/\A\(\?[a-zA-Z]*i[a-zA-Z]*(?:-[a-zA-Z]*)?:/)
+    inner, pos = trie_alternation(pattern, pos, group_ignore_case)
+    raise ArgumentError, "unterminated group in #{pattern}" unless pattern[pos] == ")"
+
+    pos += 1
+    quantifier = pattern[pos..][TRIE_QUANTIFIER] || ""
+    pos += quantifier.size
+
+    text << header << inner << ")" << quantifier
+  end
+
+  [{ text: text, tokens: tokens }, pos, ignore_case]
+end
+
+def trie_pattern(pattern)
+  rewritten, pos = trie_alternation(pattern, 0, false)
+  raise ArgumentError, "unbalanced `)` in #{pattern}" unless pos == pattern.size
+
+  rewritten
+end
@@ -0,0 +1,193 @@
+# NOTE:
+# - every regexp engine scans the example in two modes: engines with
+#   `:unicode_option` are compiled with `unicode: true` and `unicode: false`,
+#   engines without it (ruby) scan the UTF-8 haystack and, with
+#   `binary_compile:`, the ASCII-8BIT haystack with `n` flag regexps
+# - canonical `pattern:` examples are translated for each mode (see translate.rb),
+#   sets of rule files are not part of the matrix
+# - matches of modes and of engines within a mode are compared as bytes;
+#   differences are expected only on a haystack with non-ASCII text and a
+#   pattern with constructs whose meaning depends on the mode or engine
+#   (see `limitations.rb`), any other difference is reported as unexpected
+UNICODE_MODES = { "unicode" => true, "no-unicode" => false }.freeze
+UNICODE_CONSTRUCTS = {
+  /\\[wW]/ => "\\w",
+  /\\[dD]/ => "\\d",
+  /\\[sS]/ => "\\s",
+  /\\[bB]/ => "\\b",
+  /\\[pP]/ => "\\p",
+  /(?<!\\)\./ => ".",
+  /\[\^/ => "[^...]",
+  /\(\?[a-zA-Z]*i/ => "(?i)",
+  /[^\x00-\x7F]/ => "non-ASCII literal"
+}.freeze
+
+def unicode_constructs(patterns)
+  UNICODE_CONSTRUCTS.filter_map { |construct, name| name if Array(patterns).any? { _1.match?(construct) } }
+end
+
+def binary_row?(engine, mode)
+  mode == "no-unicode" && !engine_supports?(engine, :unicode_option)
+end
+
+def unicode_row_label(engine, mode)
+  "#{ENGINE_LABELS.fetch(engine)} #{binary_row?(engine, mode) ? "ascii-8bit" : mode}"
+end
+
+# returns regexps of a row, or nil when a pattern does not compile in that mode
+def unicode_row_regexps(engine, patterns, example, binary)
+  adapter = engine_adapter(engine)
+
+  compile = lambda do |pattern|
+    regexp = binary ? adapter[:binary_compile].call(pattern, engine_options(engine, example)) : cached_regexp(engine, pattern, example)
+    raise RegexpError, "invalid pattern: #{pattern}" if adapter[:valid] && !adapter[:valid].call(regexp)
+
+    regexp
+  end
+
+  patterns.is_a?(Array) ? patterns.map(&compile) : compile.call(patterns)
+rescue RegexpError, ArgumentError
+  nil
+end
+
+# returns `{ [engine, mode] => { regexps:, patterns: } }`
+def unicode_rows(example, engines)
+  rows = {}
+
+  UNICODE_MODES.each do |mode, unicode|
+    mode_example = example.merge(unicode: unicode)
+
+    example_patterns(mode_example).slice(*engines).each do |engine, patterns|
+      binary = binary_row?(engine, mode)
+      next if binary && !engine_adapter(engine)[:binary_compile]
+
+      regexps = unicode_row_regexps(engine, patterns, mode_example, binary)
+      rows[[engine, mode]] = { regexps: regexps, patterns: patterns }
+    end
+  end
+
+  rows
+end
+
+def unicode_difference(haystack, patterns)
+  return "unexpected" if haystack.ascii_only?
+
+  constructs = unicode_constructs(patterns)
+  constructs.empty? ? "unexpected" : "expected (#{constructs.join(", ")})"
+end
+
+def run_unicode_example(title, example, engines: ENGINES)
+  puts "\n-- [#{title}] unicode"
+
+  haystack = prepare_haystack(example)
+  haystack_valid_utf8 = valid_utf8_haystack(haystack)
+  haystack_binary = haystack.b
+
+  rows = unicode_rows(example, engines)
+
+  rows.each do |(engine, mode), row|
+    puts format("%20s  does not compile", unicode_row_label(engine, mode)) unless row[:regexps]
+  end
+
+  rows = rows.select { |_, row| row[:regexps] }
+
+  scanners = rows.to_h do |(engine, mode), row|
+    scanner = scanners({ engine => row[:regexps] }).fetch(engine)
+    next [[engine, mode], -> { scanner.call(haystack_binary, haystack_binary) }] if binary_row?(engine, mode)
+
+    [[engine, mode], -> { scanner.call(haystack, haystack_valid_utf8) }]
+  end
+
+  # compared as bytes, so binary and UTF-8 matches of the same text are equal
+  matches = scanners.transform_values do |scanner|
+    scanner.call.flatten.map { _1&.b }
+  end
+
+  report = Benchmark.ips do |x|
+    scanners.each do |(engine, mode), scanner|
+      x.report(unicode_row_label(engine, mode), &scanner)
+    end
+
+    x.compare!
+  end
+
+  ips = scanners.keys.zip(report.entries).to_h do |(engine, mode), entry|
+    record_result(
+      mode: "unicode",
+      example: title,
+      engine: engine,
+      entry: entry,
+      unicode_mode: mode,
+      binary: binary_row?(engine, mode),
+      haystack_bytes: haystack.bytesize,
+      match_count: matches.fetch([engine, mode]).size
+    )
+
+    [[engine, mode], entry.ips]
+  end
+
+  puts "Dropping Unicode:"
+
+  scanners.keys.map(&:first).uniq.each do |engine|
+    unicode_ips, no_unicode_ips = ips.values_at([engine, "unicode"], [engine, "no-unicode"])
+    next unless unicode_ips && no_unicode_ips
+
+    unicode_matches, no_unicode_matches = matches.values_at([engine, "unicode"], [engine, "no-unicode"])
+    difference = unicode_difference(haystack, rows.fetch([engine, "unicode"])[:patterns]) if unicode_matches != no_unicode_matches
+
+    RESULTS << {
+      mode: "unicode_speedup",
+      example: title,
+      engine: engine.to_s,
+      label: ENGINE_LABELS.fetch(engine),
+      speedup: no_unicode_ips / unicode_ips,
+      unicode_match_count: unicode_matches.size,
+      no_unicode_match_count: no_unicode_matches.size,
+      difference: difference
+    }
+
+    puts format(
+      "%20s %8.2fx as %-11s %s",
+      ENGINE_LABELS.fetch(engine),
+      no_unicode_ips / unicode_ips,
+      binary_row?(engine, "no-unicode") ? "ascii-8bit" : "no-unicode",
+      difference ? "matches differ: #{difference}, #{unicode_matches.size} vs #{no_unicode_matches.size}" : "same matches"
+    )
+  end
+
+  UNICODE_MODES.each_key do |mode|
+    mode_matches = matches.select { |(_, row_mode), _| row_mode == mode }
+    next if mode_matches.values.uniq.size <= 1
+
+    reference_engine, reference = mode_matches.first
+
+    mode_matches.drop(1).each do |(engine, _), engine_matches|
+      next if engine_matches == reference
+
+      patterns = [reference_engine, [engine, mode]].flat_map { Array(rows.fetch(_1)[:patterns]) }
+      difference = unicode_difference(haystack, patterns)
+
+      RESULTS << {
+        mode: "unicode_difference",
+        example: title,
+        engine: engine.to_s,
+        label: ENGINE_LABELS.fetch(engine),
+        reference_engine: reference_engine.first.to_s,
+        unicode_mode: mode,
+        match_count: engine_matches.size,
+        reference_match_count: reference.size,
+        difference: difference
+      }
+
+      puts format(
+        "%20s matches differ from %s in %s mode: %s, %d vs %d",
+        ENGINE_LABELS.fetch(engine),
+        ENGINE_LABELS.fetch(reference_engine.first),
+        mode,
+        difference,
+        engine_matches.size,
+        reference.size
+      )
+    end
+  end
+end
@@ -0,0 +1,238 @@
+# NOTE:
+# - variants are extra benchmark rows next to the plain scan of every engine,
+#   selected with `--variant`
+# - every variant is a method called with `(example, regexps, sets)` which
+#   returns `{ engine => ->(haystack, haystack_valid_utf8) { ... } }` for the
+#   engines it supports, results are checked by `validate_variant!`
+# - engines without `spans:` in their adapter (rust, rust_regexp has no API
+#   returning match positions) have no spans variant
+# - prefilter replaces `set.match` of set engines with a literal set (see
+#   prefilter.rb), so it only applies to rule files
+# - trie scans with literal alternations rewritten by `trie_pattern`
+# - translate scans with patterns translated from the rust pattern of the
+#   example (see translate.rb), next to the hand-written ones; engines whose
+#   translation is the hand-written pattern get no row, untranslatable rules
+#   of rule files keep their hand-written form
+# - captures and no-captures scan the same patterns with and without capture
+#   groups: patterns without captures are wrapped in one, patterns with
+#   unnamed captures are stripped of them (see `strip_captures`) and scanned
+#   with `match_scan:` where the engine has one (re2); engines whose plain
+#   pattern already is of that kind get no row
+# - fold is the case-insensitive literal fast path of ruby (see fold.rb),
+#   examples can enable variants for themselves with `variants:`
+VARIANTS = {
+  "count" => :count_scanners,
+  "spans" => :spans_scanners,
+  "prefilter" => :prefilter_scanners,
+  "trie" => :trie_scanners,
+  "translate" => :translate_scanners,
+  "captures" => :captures_scanners,
+  "no-captures" => :no_captures_scanners,
+  "fold" => :fold_scanners
+}
+
+def count_scanners(example, regexps, sets)
+  # some engines count with other patterns, e.g. re2 with captures stripped (see `count_pattern:`)
+  count_regexps = regexps.to_h do |engine, group|
+    count_pattern = engine_adapter(engine)[:count_pattern]
+    next [engine, group] unless count_pattern
+
+    patterns = Array(example_patterns(example)[engine]).map { cached_regexp(engine, count_pattern.call(_1), example) }
+    [engine, group.is_a?(Array) ? patterns : patterns.first]
+  end
+
+  scanners(count_regexps, sets, operation: :count).to_h do |engine, scanner|
+    next [engine, scanner] if set_engine?(engine) || !count_regexps[engine].is_a?(Array)
+
+    [engine, ->(haystack, haystack_valid_utf8) { scanner.call(haystack, haystack_valid_utf8).sum }]
+  end
+end
+
+def spans_scanners(example, regexps, sets)
+  with_spans = ->(engine, _) { engine_adapter(engine)[:spans] }
+
+  scanners(regexps.select(&with_spans), sets&.select(&with_spans), operation: :spans, haystack_key: :spans_haystack).to_h do |engine, scanner|
+    next [engine, scanner] if set_engine?(engine) || !regexps[engine].is_a?(Array)
+
+    [engine, ->(haystack, haystack_valid_utf8) { scanner.call(haystack, haystack_valid_utf8).flatten }]
+  end
+end
+
+def prefilter_scanners(example, regexps, sets)
+  return {} unless example[:patterns_path]
+
+  rules = example_patterns(example)[:ruby]
+  scanners = {}
+
+  sets&.each_key do |engine|
+    adapter = engine_adapter(engine)
+    next unless adapter[:prefilter_scan]
+
+    rule_prefilter = prefilter(engine, rules, example)
+    original_regexps = regexps[adapter[:set_of]]
+
+    scanners[engine] = lambda do |haystack, _|
+      adapter[:prefilter_scan].call(haystack, rule_prefilter, original_regexps)
+    end
+  end
+
+  scanners
+end
+
+def trie_scanners(example, regexps, sets)
+  patterns = example_patterns(example).slice(*regexps.keys)
+
+  trie_regexps = patterns.to_h do |engine, pattern|
+    trie_regexp = ->(original) { cached_regexp(engine, trie_pattern(original), example) }
+    [engine, pattern.is_a?(Array) ? pattern.map(&trie_regexp) : trie_regexp.call(pattern)]
+  end
+
+  scanners(trie_regexps)
+end
+
+def translate_scanners(example, regexps, sets)
+  return {} if example[:pattern]
+
+  canonical = canonical_patterns(example)
+  patterns = example_patterns(example).slice(*regexps.keys)
+  unicode = translation_unicode(example)
+
+  translated_regexps = patterns.filter_map do |engine, pattern|
+    syntax = engine_adapter(engine)[:syntax]
+
+    translated =
+      if canonical.is_a?(Array)
+        canonical.zip(pattern).map do |rule, original|
+          translate_pattern(rule, syntax, unicode: unicode)
+        rescue UntranslatablePattern
+          original
+        end
+      else
+        translate_pattern(canonical, syntax, unicode: unicode)
+      end
+
+    next if translated == pattern
+
+    [engine, translated.is_a?(Array) ? translated.map { cached_regexp(engine, _1, example) } : cached_regexp(engine, translated, example)]
+  rescue UntranslatablePattern
+    nil
+  end.to_h
+
+  scanners(translated_regexps)
+end
+
+# returns `{ engine => regexps }` of rewritten patterns, engines with
+# patterns the rewrite does not apply to are left out
+def rewritten_regexps(example, regexps, applies, rewrite)
+  example_patterns(example).slice(*regexps.keys).filter_map do |engine, pattern|
+    next unless Array(pattern).any?(&applies)
+
+    compile = ->(original) { cached_regexp(engine, applies.call(original) ? rewrite.call(original) : original, example) }
+    [engine, pattern.is_a?(Array) ? pattern.map(&compile) : compile.call(pattern)]
+  end.to_h
+end
+
+def captures_scanners(example, regexps, sets)
+  scanners(rewritten_regexps(example, regexps, ->(pattern) { !capture_groups?(pattern) }, ->(pattern) { "(#{pattern})" }))
+end
+
+def no_captures_scanners(example, regexps, sets)
+  stripped_regexps = rewritten_regexps(
+    example,
+    regexps,
+    ->(pattern) { capture_groups?(pattern) && !capture_groups?(strip_captures(pattern)) },
+    method(:strip_captures)
+  )
+
+  stripped_regexps.to_h do |engine, group|
+    match_scan = engine_adapter(engine).key?(:match_scan)
+    scanners({ engine => group }, operation: match_scan ? :match_scan : :scan, haystack_key: match_scan ? :spans_haystack : :haystack).first
+  end
+end
+
+def fold_scanners(example, regexps, sets)
+  pattern = example_patterns(example)[:ruby]
+  literals = casei_literals(pattern) if regexps[:ruby] && pattern.is_a?(String)
+  return {} unless literals
+
+  search = fold_search(literals)
+  haystack_key = [*example[:haystack].values_at(:path, :line_start, :line_end), Encoding.default_external]
+
+  {
+    ruby: lambda do |_, haystack_valid_utf8|
+      folded_haystack = cached(:folded_haystack, haystack_key) { fold_haystack(haystack_valid_utf8) }
+      ruby_fold_scan(haystack_valid_utf8, folded_haystack, search)
+    end
+  }
+end
+
+def whole_match_count(example, haystack, engine)
+  scanner = scanners(prepare_regexps(example).slice(engine), operation: :count).fetch(engine)
+  Array(scanner.call(haystack, valid_utf8_haystack(haystack))).sum
+end
+
+def validate_variant!(variant, example, haystack, results, matches)
+  results.each do |engine, result|
+    expected_count = matches.fetch(engine).size
+
+    case variant
+    when "count"
+      if result != expected_count
+        raise "Count for `#{engine}` does not eq scan match count #{expected_count}, returned: #{result}"
+      end
+    when "spans"
+      if result.size / 2 != expected_count
+        raise "Spans for `#{engine}` do not eq scan match count #{expected_count}, returned: #{result.size / 2}"
+      end
+    when "trie"
+      # same shape as in `validate_matches!`
+      result = result.reject(&:empty?) if example_patterns(example)[engine].is_a?(Array)
+
+      if result.flatten(1) != matches.fetch(engine)
+        raise "Trie matches for `#{engine}` are different from scan matches"
+      end
+    when "translate"
+      result = result.reject(&:empty?) if example_patterns(example)[engine].is_a?(Array)
+      # translated patterns match as the canonical rust one does
+      canonical_engine = matches.keys.find { !set_engine?(_1) && engine_adapter(_1)[:syntax] == :rust }
+
+      if result.flatten(1) != matches.fetch(canonical_engine || engine)
+        raise "Translated matches for `#{engine}` are different from #{canonical_engine || "scan"} matches"
+      end
+    when "captures", "no-captures"
+      # scan matches of patterns with captures are their captures, so whole matches are counted
+      expected_count = whole_match_count(example, haystack, engine)
+      match_count = result.flatten(1).size
+
+      if match_count != expected_count
+        raise "#{variant.capitalize} match count for `#{engine}` does not eq whole match count #{expected_count}, returned: #{match_count}"
+      end
+    when "fold"
+      raise "Folded matches for `#{engine}` are different from scan matches" if result != matches.fetch(engine)
+    when "prefilter"
+      # set match order is not specified, prefilter scans rules in rule order
+      if result.flatten(1).tally != matches.fetch(engine).tally
+        raise "Prefiltered matches for `#{engine}` are different from set scan matches"
+      end
+    else
+      raise ArgumentError, "unknown variant: #{variant}"
+    end
+  end
+
+  # ruby spans of invalid UTF-8 haystack are offsets into its scrubbed copy
+  compared =
+    if variant == "spans" && haystack.valid_encoding?
+      results
+    elsif %w[captures no-captures].include?(variant)
+      # whole matches, with or without a group around them
+      results.transform_values(&:flatten)
+    end
+  return unless compared
+
+  # engines with specific match counts should not be compared
+  engines_to_skip = example[:validations].values.flat_map(&:keys).uniq - [:*]
+
+  if compared.except(*engines_to_skip).values.uniq.size > 1
+    raise "#{variant.capitalize} are different between engines"
+  end
+end